@@ -4,47 +4,72 @@
 
 from project.common import check_column_existence, make_blocks
 from dtw import DTW
+from benchmark import fastdtw_error
+from pairwise import pairwise_costs
 import numpy as np
 import pandas as pd
 from os import listdir
 
 
 class AnalyseData:
-    def __block_analysis(self, directory, method):
+    def __block_analysis(self, directory, method, path, constraint, radius, cache):
         filenames = self.__get_filenames(directory)
         results = np.zeros([len(filenames), 3])
         for i in range(len(filenames)):
             filepath = f"patients/standardized/{directory}/{filenames[i]}"
             x, y = self.__get_data(filepath, x=directory, y='Toxa')
             for j in range(len(x)):
-                dtw = DTW(x[j], y[j])
+                dtw = DTW(x[j], y[j], path=path, constraint=constraint, radius=radius, cache=cache)
                 results[i][j] = dtw.calc_alignment_cost(method=method)
         return results
 
-    def __window_analysis(self, directory, method, window_size, step):
+    def __window_analysis(self, directory, method, window_size, step, path, constraint, radius, cache):
         filenames = self.__get_filenames(directory)
         results = np.zeros([len(filenames), 3])
         for i in range(len(filenames)):
             filepath = f"patients/standardized/{directory}/{filenames[i]}"
             x, y = self.__get_data(filepath, x=directory, y='Toxa')
             for j in range(len(x)):
-                dtw = DTW(x[j], y[j])
+                dtw = DTW(x[j], y[j], path=path, constraint=constraint, radius=radius, cache=cache)
                 results[i][j] = dtw.find_alignment_cost(method=method, look_for="MEAN", window_size=window_size,
                                                         step=step)
         return results
 
-    def analyze(self, directory, method, analysis=None, export_results=False):
+    def analyze(self, directory, method, analysis=None, export_results=False, path="matrix", constraint=None,
+                radius=None, cache=None):
         window_size = 6 * 60 * 60 // 10
         step = 1 * 60 * 60 // 10
         if analysis == 'block':
-            results = self.__block_analysis(directory=directory, method=method)
+            results = self.__block_analysis(directory=directory, method=method, path=path, constraint=constraint,
+                                            radius=radius, cache=cache)
         elif analysis == 'window':
-            results = self.__window_analysis(directory=directory, method=method, window_size=window_size, step=step)
+            results = self.__window_analysis(directory=directory, method=method, window_size=window_size, step=step,
+                                             path=path, constraint=constraint, radius=radius, cache=cache)
         else:
             raise ValueError(f"Allowed analysis are 'block' and 'window'! Got '{analysis}' instead.")
         if export_results:
             self.__export_results(analysis=analysis, directory=directory, method=method, results=results)
 
+    def benchmark(self, directory, method, radius):
+        pairs = []
+        for filename in self.__get_filenames(directory):
+            x, y = self.__get_data(f"patients/standardized/{directory}/{filename}", x=directory, y='Toxa')
+            pairs += list(zip(x, y))
+        errors, max_error, mean_error = fastdtw_error(pairs, method=method, radius=radius)
+        print(f"FastDTW (radius={radius}) on {len(pairs)} blocks: maximum relative error {max_error:.2%}, mean "
+              f"relative error {mean_error:.2%}.")
+        return errors, max_error, mean_error
+
+    def distance_matrix(self, directory, column, filename, method, constraint=None, radius=None, max_cost=None,
+                        max_workers=None):
+        signals = []
+        for name in self.__get_filenames(directory):
+            df = pd.DataFrame(pd.read_csv(f"patients/standardized/{directory}/{name}", delimiter=';'))
+            check_column_existence(df=df, col=column)
+            signals.append(df[column].to_numpy())
+        return pairwise_costs(signals, filename, method=method, max_cost=max_cost, max_workers=max_workers,
+                              constraint=constraint, radius=radius)
+
     @staticmethod
     def __get_filenames(directory):
         filepath = f"patients/standardized/{directory}"
@@ -0,0 +1,186 @@
+"""
+@author: Radoslaw Plawecki
+Global constraints of DTW stored as a band of columns allowed in each row of the accumulated cost matrix.
+Sources:
+[1] Sakoe, H., Chiba, S. (1978). Dynamic programming algorithm optimization for spoken word recognition. IEEE
+Transactions on Acoustics, Speech, and Signal Processing, 26(1), 43-49.
+[2] Itakura, F. (1975). Minimum prediction residual principle applied to speech recognition. IEEE Transactions on
+Acoustics, Speech, and Signal Processing, 23(1), 67-72.
+"""
+
+import numpy as np
+import tempfile
+
+# FastDTW is not a global constraint, but its band is found from signals and used the same way
+CONSTRAINTS = (None, "sakoe-chiba", "itakura", "fastdtw")
+
+
+def check_constraint(constraint, radius, slope, lag=0):
+    """
+    Function to check if params of a global constraint are valid.
+    :param constraint: global constraint (None, sakoe-chiba, itakura) or FastDTW (fastdtw).
+    :param radius: radius of the Sakoe-Chiba band or of FastDTW.
+    :param slope: maximum slope of the Itakura parallelogram.
+    :param lag: offset of the Sakoe-Chiba band in samples.
+    :raise ValueError: if a constraint is unknown or its param is missing or invalid.
+    """
+    if constraint not in CONSTRAINTS:
+        raise ValueError(f"Allowed constraints are: None, 'sakoe-chiba', 'itakura' and 'fastdtw'. Got '{constraint}' "
+                         f"instead.")
+    if constraint == "sakoe-chiba" and (radius is None or radius < 0):
+        raise ValueError("Sakoe-Chiba band requires a non-negative radius!")
+    if constraint == "fastdtw" and (radius is None or radius < 0):
+        raise ValueError("FastDTW requires a non-negative radius!")
+    if constraint == "itakura" and (slope is None or slope < 1):
+        raise ValueError("Itakura parallelogram requires a slope not less than 1!")
+    if lag and constraint != "sakoe-chiba":
+        raise ValueError(f"Only Sakoe-Chiba band can be offset by a lag! Got constraint '{constraint}' instead.")
+
+
+def _finalize_bounds(lo, hi, m):
+    """
+    Function to make bounds of a band valid, i.e. monotonic, connected and containing both corners of a matrix.
+    :param lo: first allowed column in rows 1..n.
+    :param hi: column after the last allowed one in rows 1..n.
+    :param m: number of columns of a matrix without the initial one.
+    :return: bounds for rows 0..n of a matrix.
+    """
+    lo = np.clip(lo, 1, m).astype(np.int64)
+    hi = np.clip(hi, 2, m + 1).astype(np.int64)
+    lo[0], hi[-1] = 1, m + 1
+    lo, hi = np.maximum.accumulate(lo), np.maximum.accumulate(np.maximum(hi, lo + 1))
+    # every row has to overlap with the previous one, otherwise there is no warping path
+    lo[1:] = np.minimum(lo[1:], hi[:-1])
+    return np.concatenate(([0], lo)), np.concatenate(([1], hi))
+
+
+def band_bounds(n, m, constraint=None, radius=None, slope=None, lag=0):
+    """
+    Function to get bounds of a band, i.e. columns [lo[i], hi[i]) of a matrix computed in each row i.
+    :param n: length of the first signal.
+    :param m: length of the second signal.
+    :param constraint: global constraint (None, sakoe-chiba, itakura).
+    :param radius: radius of the Sakoe-Chiba band.
+    :param slope: maximum slope of the Itakura parallelogram.
+    :param lag: offset of the Sakoe-Chiba band in samples, the band follows the diagonal moved by a lag to the right
+                (positive) or to the left (negative), and it is widened at both corners so it contains them.
+    :return: first allowed column and column after the last allowed one for each row.
+    :raise ValueError: for FastDTW, whose band depends on signals and is found by fastdtw_bounds().
+    """
+    check_constraint(constraint, radius, slope, lag)
+    if constraint == "fastdtw":
+        raise ValueError("Band of FastDTW depends on signals, use fastdtw_bounds() instead!")
+    if constraint is None or n == 0 or m == 0:
+        # the whole matrix, including the initial row and column, so a band is laid out as a full matrix, an empty
+        # signal has no warping path to constrain
+        return np.zeros(n + 1, dtype=np.int64), np.full(n + 1, m + 1, dtype=np.int64)
+    u = np.arange(n, dtype=float)
+    if constraint == "sakoe-chiba":
+        # the band follows the diagonal joining both corners, also for signals of different lengths
+        centre = u * (m - 1) / max(n - 1, 1) + lag
+        lower, upper = centre - radius, centre + radius
+    elif constraint == "itakura":
+        big_n, big_m = n - 1, m - 1
+        lower = np.maximum(u / slope, big_m - slope * (big_n - u))
+        upper = np.minimum(slope * u, big_m - (big_n - u) / slope)
+    # tolerance protects cells lying exactly on the border against rounding
+    return _finalize_bounds(np.ceil(lower - 1e-9) + 1, np.floor(upper + 1e-9) + 2, m)
+
+
+def full(shape, fill_value, dtype=float, on_disk=False):
+    """
+    Function to create an array filled with a value, in memory or in a memory-mapped temporary file.
+    :param shape: shape of an array.
+    :param fill_value: value of elements.
+    :param dtype: type of elements.
+    :param on_disk: whether to store elements in a memory-mapped temporary file instead of memory. A file is created
+                    in the default temporary directory (TMPDIR) and removed when an array is released.
+    :return: filled array.
+    """
+    if not on_disk:
+        return np.full(shape, fill_value, dtype=dtype)
+    # an unnamed file is removed by the system once the mapping is closed
+    with tempfile.TemporaryFile() as file:
+        array = np.memmap(file, dtype=dtype, mode="w+", shape=shape)
+    array[:] = fill_value
+    return array
+
+
+class BandedMatrix:
+    def __init__(self, lo, hi, fill_value=np.inf, dtype=float, on_disk=False):
+        """
+        Method to initialize params of a class. Only cells inside a band are stored, row i keeps columns
+        [lo[i], hi[i]) in values[i, :hi[i] - lo[i]]. A band narrower than a matrix has one more column never written,
+        read for all cells outside a band.
+        :param lo: first allowed column for each row.
+        :param hi: column after the last allowed one for each row.
+        :param fill_value: initial value of the stored cells.
+        :param dtype: type of the stored cells.
+        :param on_disk: whether to store cells in a memory-mapped temporary file instead of memory. A file is created
+                        in the default temporary directory (TMPDIR) and removed when cells are released.
+        """
+        self.lo, self.hi = np.asarray(lo), np.asarray(hi)
+        self.shape = (len(self.lo), int(self.hi[-1]))
+        self.dense = not self.lo.any()
+        self.width = int(np.max(self.hi - self.lo))
+        self.values = full((len(self.lo), self.width + (not self.dense)), fill_value, dtype, on_disk)
+
+    @classmethod
+    def initialized(cls, lo, hi, dtype=float, on_disk=False):
+        """
+        Method to create an accumulated cost matrix with the initial row and column set.
+        :param lo: first allowed column for each row.
+        :param hi: column after the last allowed one for each row.
+        :param dtype: type of cells, float or float32.
+        :param on_disk: whether to store cells in a memory-mapped temporary file instead of memory.
+        :return: initialized matrix.
+        """
+        matrix = cls(lo, hi, dtype=dtype, on_disk=on_disk)
+        matrix.values[0, 0] = 0
+        return matrix
+
+    def __getitem__(self, index):
+        """
+        Method to get a value of a cell, cells outside a band are infinite.
+        :param index: row and column of a cell.
+        :return: value of a cell.
+        """
+        i, j = index
+        if self.lo[i] <= j < self.hi[i]:
+            return self.values[i, j - self.lo[i]]
+        return np.inf
+
+    def take(self, i, j):
+        """
+        Method to get values of many cells at once, cells outside a band are infinite.
+        :param i: array of rows.
+        :param j: array of columns.
+        :return: values of cells.
+        """
+        if self.dense:
+            inside = (j >= 0) & (j < self.shape[1])
+            return np.where(inside, self.values[i, np.where(inside, j, 0)], np.inf)
+        # cells outside a band are read from the last column or from cells of a row never written
+        return self.values[i, np.minimum(np.maximum(j - self.lo[i], -1), self.width)]
+
+    def put(self, i, j, values):
+        """
+        Method to set values of cells inside a band.
+        :param i: array of rows.
+        :param j: array of columns.
+        :param values: values to set.
+        """
+        self.values[i, j - self.lo[i]] = values
+
+    def to_dense(self):
+        """
+        Method to get a full matrix, cells outside a band are infinite. Cells stored on disk give a full matrix
+        stored on disk too.
+        :return: full matrix.
+        """
+        if self.dense:
+            return self.values
+        dense = full(self.shape, np.inf, self.values.dtype, isinstance(self.values, np.memmap))
+        for i in range(self.shape[0]):
+            dense[i, self.lo[i]:self.hi[i]] = self.values[i, :self.hi[i] - self.lo[i]]
+        return dense
@@ -0,0 +1,28 @@
+"""
+@author: Radoslaw Plawecki
+Error of approximate DTW versus exact DTW on a benchmark set of pairs of signals.
+"""
+
+from project.dtw.dtw import DTW
+import numpy as np
+
+
+def fastdtw_error(pairs, method, radius, **params):
+    """
+    Function to compare alignment costs of FastDTW with the exact ones. The exact distance is computed without a full
+    matrix, so long signals fit in memory.
+    :param pairs: list of (x, y) pairs of signals.
+    :param method: method to calculate alignment cost.
+    :param radius: radius of FastDTW.
+    :param params: other params of DTW objects, e.g. var or engine.
+    :return: relative errors per pair, the maximum and the mean relative error.
+    """
+    errors = np.zeros(len(pairs))
+    for k, (x, y) in enumerate(pairs):
+        exact = DTW(x, y, path="linear", **params).calc_alignment_cost(method=method)
+        approximate = DTW(x, y, constraint="fastdtw", radius=radius, **params).calc_alignment_cost(method=method)
+        if exact == 0:
+            errors[k] = 0 if approximate == 0 else np.inf
+        else:
+            errors[k] = abs(approximate - exact) / abs(exact)
+    return errors, np.max(errors, initial=0), np.mean(errors) if len(pairs) else 0
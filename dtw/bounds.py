@@ -0,0 +1,165 @@
+"""
+@author: Radoslaw Plawecki
+Lower and upper bounds of the last cell of the accumulated cost matrix, cheap enough to skip windows of signals
+before DTW is computed for them.
+Sources:
+[1] Kim, S. W., Park, S., Chu, W. W. (2001). An index-based approach for similarity search supporting time warping in
+large sequence databases. Proceedings of the 17th International Conference on Data Engineering, 607-614.
+[2] Keogh, E., Ratanamahatana, C. A. (2005). Exact indexing of dynamic time warping. Knowledge and Information
+Systems, 7(3), 358-386.
+[3] Rakthanmanon, T. et al. (2012). Searching and mining trillions of time series subsequences under dynamic time
+warping. Proceedings of the 18th ACM SIGKDD International Conference on Knowledge Discovery and Data Mining, 262-270.
+"""
+
+from project.dtw.kernels import local_distance
+import numpy as np
+
+# minimum relative margin protecting against rounding, bounds are summed in a different order than cells of a matrix
+TOLERANCE = 1e-9
+
+
+def relative_tolerance(dtype, length):
+    """
+    Function to get a relative margin of bounds. A sum of non-negative values has a relative rounding error of at most
+    its length times the machine epsilon.
+    :param dtype: type of cells of a matrix.
+    :param length: maximum number of summed values, i.e. the sum of lengths of signals.
+    :return: relative margin.
+    """
+    return max(TOLERANCE, length * np.finfo(dtype).eps)
+
+
+def transpose_bounds(lo, hi, m):
+    """
+    Function to get bounds of a band for a transposed matrix, i.e. rows allowed in each column.
+    :param lo: first allowed column for each row.
+    :param hi: column after the last allowed one for each row.
+    :param m: length of the second signal.
+    :return: first allowed row and row after the last allowed one for each column.
+    """
+    n = len(lo) - 1
+    if not lo.any():
+        return np.zeros(m + 1, dtype=np.int64), np.full(m + 1, n + 1, dtype=np.int64)
+    columns = np.arange(1, m + 1)
+    lo_t = np.searchsorted(hi[1:], columns, side="right") + 1
+    hi_t = np.searchsorted(np.maximum(lo[1:], 1), columns, side="right") + 1
+    return np.concatenate(([0], lo_t)), np.concatenate(([1], hi_t))
+
+
+def envelopes(s, lo, hi):
+    """
+    Function to get the lower and upper envelope of a signal, i.e. minimum and maximum of samples of a signal which
+    may be matched with each sample of the other signal inside a band.
+    :param s: signal, or an array of signals with samples along the last axis.
+    :param lo: first allowed column for each row.
+    :param hi: column after the last allowed one for each row.
+    :return: lower and upper envelope for each row.
+    """
+    shape = s.shape[:-1] + (len(lo) - 1,)
+    if not lo.any():
+        # without a constraint every sample may be matched with any other one
+        return (np.broadcast_to(s.min(axis=-1, keepdims=True), shape),
+                np.broadcast_to(s.max(axis=-1, keepdims=True), shape))
+    lower, upper = np.empty(shape), np.empty(shape)
+    for i, (start, stop) in enumerate(zip((np.maximum(lo[1:], 1) - 1).tolist(), (hi[1:] - 1).tolist())):
+        lower[..., i] = s[..., start:stop].min(axis=-1)
+        upper[..., i] = s[..., start:stop].max(axis=-1)
+    return lower, upper
+
+
+def lb_kim(x, y):
+    """
+    Function to calculate LB_Kim, i.e. distances of the first and the last samples, which are matched by every
+    warping path.
+    :param x: first signal, or an array of signals with samples along the last axis.
+    :param y: second signal, or an array of signals with samples along the last axis.
+    :return: lower bound of the last cell of a matrix.
+    """
+    first = np.abs(x[..., 0] - y[..., 0])
+    if x.shape[-1] == 1 and y.shape[-1] == 1:
+        return first
+    return first + np.abs(x[..., -1] - y[..., -1])
+
+
+def keogh_terms(x, lower, upper):
+    """
+    Function to calculate distances of samples of a signal to the envelope of the other signal. Every sample is matched
+    at least once by every warping path and never closer than its distance to an envelope.
+    :param x: signal, or an array of signals with samples along the last axis.
+    :param lower: lower envelope of the other signal.
+    :param upper: upper envelope of the other signal.
+    :return: distance of each sample to an envelope.
+    """
+    return np.maximum(np.maximum(x - upper, lower - x), 0)
+
+
+def lb_keogh(x, lower, upper):
+    """
+    Function to calculate LB_Keogh, i.e. the sum of distances of samples of a signal to the envelope of the other
+    signal.
+    :param x: signal, or an array of signals with samples along the last axis.
+    :param lower: lower envelope of the other signal.
+    :param upper: upper envelope of the other signal.
+    :return: lower bound of the last cell of a matrix.
+    """
+    return np.sum(keogh_terms(x, lower, upper), axis=-1)
+
+
+def lower_bounds(x, y, lo, hi, multivariate=False):
+    """
+    Function to calculate the tightest of LB_Kim and LB_Keogh of both signals against each other. Envelopes are
+    computed once for all signals in an array. A distance of multivariate samples is the sum of distances in all
+    dimensions, so bounds of dimensions are added.
+    :param x: first signal, or an array of signals with samples along the last axis.
+    :param y: second signal, or an array of signals with samples along the last axis.
+    :param lo: first allowed column for each row.
+    :param hi: column after the last allowed one for each row.
+    :param multivariate: whether signals are multivariate, with samples along the second to last axis and dimensions
+                         along the last one.
+    :return: lower bound of the last cell of a matrix, and distances of samples of the first and the second signal to
+             envelopes of the other one.
+    """
+    dimensions = 1
+    if multivariate:
+        x, y, dimensions = np.moveaxis(x, -1, 0), np.moveaxis(y, -1, 0), x.shape[-1]
+    x_terms = keogh_terms(x, *envelopes(y, lo, hi))
+    y_terms = keogh_terms(y, *envelopes(x, *transpose_bounds(lo, hi, y.shape[-1])))
+    kim = lb_kim(x, y)
+    if multivariate:
+        kim, x_terms, y_terms = kim.sum(axis=0), x_terms.sum(axis=0), y_terms.sum(axis=0)
+    bound = np.maximum(np.maximum(kim, x_terms.sum(axis=-1)), y_terms.sum(axis=-1))
+    tolerance = relative_tolerance(bound.dtype, (x.shape[-1] + y.shape[-1]) * dimensions)
+    return bound * (1 - tolerance), x_terms, y_terms
+
+
+def remaining_bounds(x_terms, y_terms):
+    """
+    Function to calculate lower bounds of the cost of a warping path after each row and after each column of a matrix,
+    used to abandon a calculation early.
+    :param x_terms: distances of samples of the first signal to the envelope of the second one.
+    :param y_terms: distances of samples of the second signal to the envelope of the first one.
+    :return: bounds after rows 0..n and after columns 0..m.
+    """
+    rows = np.append(np.cumsum(x_terms[::-1])[::-1], 0)
+    columns = np.append(np.cumsum(y_terms[::-1])[::-1], 0)
+    tolerance = relative_tolerance(rows.dtype, len(rows) + len(columns))
+    return rows * (1 - tolerance), columns * (1 - tolerance)
+
+
+def upper_bounds(x, y, multivariate=False):
+    """
+    Function to calculate the cost of the diagonal warping path, which lies inside every global constraint of signals of
+    the same length. The cost is summed in the order of a matrix, so it is never lower than the last cell.
+    :param x: first signal, or an array of signals with samples along the last axis.
+    :param y: second signal, or an array of signals with samples along the last axis.
+    :param multivariate: whether signals are multivariate, with samples along the second to last axis and dimensions
+                         along the last one.
+    :return: upper bound of the last cell of a matrix, infinite for signals of different lengths.
+    """
+    if multivariate:
+        x, y = np.moveaxis(x, -1, 0), np.moveaxis(y, -1, 0)
+    else:
+        x, y = x[np.newaxis], y[np.newaxis]
+    if x.shape[-1] != y.shape[-1]:
+        return np.full(x.shape[1:-1], np.inf)
+    return np.cumsum(local_distance(x, y), axis=-1)[..., -1]
@@ -0,0 +1,168 @@
+"""
+@author: Radoslaw Plawecki
+Persistent cache of results of DTW addressed by the content of signals and params, so unchanged computations are read
+from disk instead of being repeated.
+"""
+
+import hashlib
+import numpy as np
+import os
+import tempfile
+import zipfile
+
+# default maximum size of all cached results, the least recently used ones are removed above it
+MAX_BYTES = 2 ** 30
+# number of writes after which the size of a cache is counted again from its directory, because other processes
+# sharing a directory write files as well
+RECOUNT_WRITES = 100
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        """
+        Method to initialize params of a class. Results are stored as compressed NumPy archives (.npz), one file per
+        key. A file is used when it is read or written, so files used the longest time ago are removed first. The size
+        of a cache is updated by every write, and a directory is listed only on the first write, every RECOUNT_WRITES
+        writes and when results are removed.
+        :param directory: directory to store results in, created if it does not exist.
+        :param max_bytes: maximum size of all stored results in bytes.
+        """
+        if max_bytes <= 0:
+            raise ValueError("Maximum size of a cache must have a positive value!")
+        os.makedirs(directory, exist_ok=True)
+        self.directory, self.max_bytes = directory, max_bytes
+        # size of stored results, counted on the first write, and the number of writes
+        self.__size, self.__writes = None, 0
+
+    @staticmethod
+    def key(arrays, **params):
+        """
+        Method to get a key of a result, i.e. a hash of the content, type and shape of arrays and of params.
+        :param arrays: list of arrays a result is computed from, e.g. signals after a variant of DTW is applied.
+        :param params: params a result depends on, e.g. a constraint or a size of a window.
+        :return: key as a hexadecimal string.
+        """
+        digest = hashlib.sha256()
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            digest.update(f"{array.dtype.str}{array.shape}".encode())
+            digest.update(array.tobytes())
+        digest.update(repr(sorted(params.items())).encode())
+        return digest.hexdigest()
+
+    def __path(self, key):
+        """
+        Method to get a path to a file of a result.
+        :param key: key of a result.
+        :return: path to a file.
+        """
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Method to read a result. A damaged file is removed and treated as a missing one.
+        :param key: key of a result.
+        :return: dictionary with arrays of a result, None if a result is not stored.
+        """
+        path = self.__path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            self.__remove(path)
+            return None
+        self.__touch(path)
+        return arrays
+
+    def put(self, key, **arrays):
+        """
+        Method to store a result. A file is written under a temporary name and renamed, so readers never see a partial
+        file, also when many processes share a cache.
+        :param key: key of a result.
+        :param arrays: arrays of a result by their names.
+        """
+        path = self.__path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+            np.savez_compressed(file, **arrays)
+        written, replaced = os.path.getsize(file.name), self.__file_size(path)
+        os.replace(file.name, path)
+        self.__writes += 1
+        if self.__size is None or self.__writes % RECOUNT_WRITES == 0:
+            self.__size = sum(size for _, size, _ in self.__entries())
+        else:
+            self.__size += written - replaced
+        if self.__size > self.max_bytes:
+            self.__evict()
+
+    def clear(self):
+        """
+        Method to remove all stored results.
+        """
+        for path, _, _ in self.__entries():
+            self.__remove(path)
+        self.__size = 0
+
+    def __entries(self):
+        """
+        Method to list stored results.
+        :return: list with paths, sizes and times of the last use of files.
+        """
+        entries = []
+        with os.scandir(self.directory) as files:
+            for file in files:
+                if file.name.endswith(".npz"):
+                    try:
+                        stat = file.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((file.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def __evict(self):
+        """
+        Method to remove the least recently used results until their size is not greater than the maximum one.
+        """
+        entries = sorted(self.__entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self.__remove(path)
+            total -= size
+        self.__size = total
+
+    @staticmethod
+    def __file_size(path):
+        """
+        Method to get the size of a file, which may be already removed by another process.
+        :param path: path to a file.
+        :return: size of a file in bytes, 0 if it does not exist.
+        """
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def __touch(path):
+        """
+        Method to mark a file as used now.
+        :param path: path to a file.
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __remove(path):
+        """
+        Method to remove a file, which may be already removed by another process.
+        :param path: path to a file.
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
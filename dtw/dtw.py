@@ -9,29 +9,114 @@ https://github.com/kamperh/lecture_dtw_notebook/blob/main/dtw.ipynb. Access: 29.
 """
 
 from project.common import use_latex
+from project.dtw.band import BandedMatrix, band_bounds, check_constraint, full
+from project.dtw.cache import ResultCache
+from project.dtw.fastdtw import fastdtw_bounds
+from project.dtw.bounds import lower_bounds, relative_tolerance, remaining_bounds, upper_bounds
+from project.dtw.kernels import (ENGINES, fill_loop, fill_wavefront, fill_block_wavefront, fill_tiled, distance_loop,
+                                 distance_wavefront, trace_path, trace_paths_batch)
+from project.dtw.hirschberg import trace_path_linear
+from project.dtw.lag import estimate_lag
+from project.dtw.reducers import streaming_extreme, streaming_mean
+from project.dtw.result import DTWResult
+from project.dtw.subsequence import find_subsequences
 import numpy as np
+import pandas as pd
+import threading
 import matplotlib.pyplot as plt
 
+ALIGNMENT_METHODS = ("d-method", "td-method", "c-method")
+# record with alignment costs calculated using all methods
+ALIGNMENT_COSTS_DTYPE = np.dtype([(method, float) for method in ALIGNMENT_METHODS])
+PATH_MODES = ("matrix", "linear")
+# types of cells of matrices, float32 halves memory at the cost of precision
+DTYPES = (np.float32, np.float64)
+# maximum number of cells of matrices of windows computed at once in the batched mode
+BATCH_CELLS = 2 ** 22
+# maximum number of rows and columns of a plotted matrix, larger matrices are plotted every few cells
+PLOT_CELLS = 2000
 
-class DTW:
-    __cost_matrix = []
-    __matches, __insertions, __deletions = 0, 0, 0
-    __path = []
 
-    def __init__(self, x, y, var=None):
+class DTW:
+    def __init__(self, x, y, var=None, engine="wavefront", constraint=None, radius=None, slope=None, path="matrix",
+                 dtype=float, cache=None, lag=None):
         """
         Method to initialize params of a class.
-        :param x: first signal.
-        :param y: second signal.
+        :param x: first signal, multivariate signals (e.g. DataFrame with many metrics) with samples in rows and
+                  dimensions in columns. A distance of multivariate samples is the sum of absolute differences in all
+                  dimensions (dependent DTW), so all dimensions are aligned by one warping path.
+        :param y: second signal, with the same number of dimensions as the first one.
+        :param var: variant of DTW, classic (None) or derivative (DDTW), derivatives are calculated for each dimension.
+        :param engine: engine to fill a matrix, vectorized along anti-diagonals (wavefront), cell by cell (loop), or
+                       tile by tile into a memory-mapped temporary file (tiled) for matrices larger than memory. All
+                       engines give the same results.
+        :param constraint: global constraint, none (None), Sakoe-Chiba band (sakoe-chiba) or Itakura parallelogram
+                           (itakura), or approximate multiresolution DTW (fastdtw). Only cells inside a constraint are
+                           allocated and computed. FastDTW never gives a distance lower than the exact one.
+        :param radius: radius of the Sakoe-Chiba band or of FastDTW in samples.
+        :param slope: maximum slope of the Itakura parallelogram.
+        :param path: way to find a warping path, from a full matrix (matrix) or by divide and conquer without a full
+                     matrix (linear). Both give the same path.
+        :param dtype: type of signals and cells of a matrix, float (float64) or float32. Every cell sums at most n + m
+                      non-negative distances, so float32 cells, and alignment costs using the distance method, differ
+                      from float64 ones by a relative error of at most (n + m) * 6e-8, e.g. 1e-3 for blocks of 8640
+                      samples, and typically much less. A warping path may differ where predecessors of a cell are
+                      equal within this error, and then alignment costs using the time-distance and cost methods are
+                      costs of another path, so their error is not bounded.
+        :param cache: ResultCache object to read and store a distance, a warping path and alignment costs of windows
+                      in, None not to use a cache. Results are addressed by signals after a variant and a type are
+                      applied, and by a band, so they are shared by all engines and ways to find a path.
+        :param lag: offset of the Sakoe-Chiba band in samples, i.e. a delay of the second signal behind the first one,
+                    None for no offset, or 'auto' to estimate it by FFT cross-correlation of signals. Signals with a
+                    constant delay are aligned inside a narrow band around the offset diagonal. Windows of signals use
+                    the lag of whole signals.
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Allowed engines are 'wavefront', 'loop' and 'tiled'. Got '{engine}' instead.")
+        if path not in PATH_MODES:
+            raise ValueError(f"Allowed ways to find a path are 'matrix' and 'linear'. Got '{path}' instead.")
+        check_constraint(constraint, radius, slope, lag)
+        if lag is not None and lag != "auto" and not isinstance(lag, (int, np.integer)):
+            raise ValueError(f"Lag must be a number of samples, 'auto' or None. Got '{lag}' instead.")
+        if np.dtype(dtype) not in DTYPES:
+            raise ValueError(f"Allowed types of a matrix are float32 and float64. Got '{np.dtype(dtype)}' instead.")
+        self.engine, self.path, self.dtype = engine, path, np.dtype(dtype)
+        self.constraint, self.radius, self.slope = constraint, radius, slope
+        self.cache = cache
+        # a matrix with its chosen steps, a result and a distance are computed once, on the first use
+        self.__matrix, self.__steps, self.__result, self.__distance = None, None, None, None
+        # an object may be shared by threads, so lazy results are computed under a lock, at most once
+        self.__lock = threading.RLock()
         if var is None:
-            self.x = np.array(x)
-            self.y = np.array(y)
+            self.x = np.array(x, dtype=self.dtype)
+            self.y = np.array(y, dtype=self.dtype)
         elif var == "DDTW":
-            self.x = self.derivative_signal(np.array(x))
-            self.y = self.derivative_signal(np.array(y))
+            self.x = self.derivative_signal(np.array(x)).astype(self.dtype)
+            self.y = self.derivative_signal(np.array(y)).astype(self.dtype)
         else:
             raise ValueError("Allowed variants of DTW: classic (var=None), derivative (var=DDTW).")
+        if self.x.ndim > 2 or self.x.ndim != self.y.ndim or self.x.shape[1:] != self.y.shape[1:]:
+            raise ValueError(f"Signals must have samples in rows and the same number of dimensions in columns. Got "
+                             f"shapes {self.x.shape} and {self.y.shape} instead.")
+        self.lag = estimate_lag(self.x, self.y) if lag == "auto" else int(lag or 0)
+
+    def __getstate__(self):
+        """
+        Method to get the state of an object for pickling, e.g. to send it to a pool of processes. A lock cannot be
+        pickled, so it is left out.
+        :return: attributes of an object without a lock.
+        """
+        state = self.__dict__.copy()
+        del state["_DTW__lock"]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Method to restore an object from its pickled state with a new lock.
+        :param state: attributes of an object without a lock.
+        """
+        self.__dict__.update(state)
+        self.__lock = threading.RLock()
 
     @staticmethod
     def derivative_signal(s):
@@ -41,79 +126,126 @@ class DTW:
         """
         s = np.array(s)
         derivative = np.zeros_like(s, dtype=float)
-        for i in range(1, len(s) - 1):
-            derivative[i] = ((s[i] - s[i - 1]) + ((s[i + 1] - s[i - 1]) / 2)) / 2
+        derivative[1:-1] = ((s[1:-1] - s[:-2]) + ((s[2:] - s[:-2]) / 2)) / 2
         derivative[0] = (s[1] - s[0])
         derivative[-1] = (s[-1] - s[-2])
         return derivative
 
-    def __initialize_matrix(self):
+    def __bounds(self, x, y):
+        """
+        Method to get a band of a matrix of signals, given by a global constraint or found by FastDTW.
+        :param x: first signal.
+        :param y: second signal.
+        :return: first allowed column and column after the last allowed one for each row of a matrix.
+        """
+        if self.constraint == "fastdtw":
+            return fastdtw_bounds(x, y, self.radius)
+        return band_bounds(len(x), len(y), self.constraint, self.radius, self.slope, self.lag)
+
+    def __cache_key(self, operation, **params):
+        """
+        Method to get a key of a result of signals in a cache.
+        :param operation: name of a result, e.g. a distance or a warping path.
+        :param params: other params a result depends on, e.g. a size of a window.
+        :return: key of a result.
+        """
+        return ResultCache.key([self.x, self.y], operation=operation, constraint=self.constraint, radius=self.radius,
+                               slope=self.slope, lag=self.lag, **params)
+
+    def __fill(self):
         """
-        Method to initialize a matrix.
-        :return: initialized matrix.
+        Method to fill cells of a matrix inside a global constraint. A matrix is filled only once.
+        :return: filled matrix as BandedMatrix object.
+        """
+        with self.__lock:
+            if self.__matrix is None:
+                x, y = self.x, self.y
+                lo, hi = self.__bounds(x, y)
+                on_disk = self.engine == "tiled"
+                matrix = BandedMatrix.initialized(lo, hi, dtype=self.dtype, on_disk=on_disk)
+                steps = BandedMatrix(lo, hi, fill_value=-1, dtype=np.int8, on_disk=on_disk)
+                if self.engine == "loop":
+                    fill_loop(x, y, matrix, steps)
+                elif self.engine == "tiled":
+                    fill_tiled(x, y, matrix, steps)
+                else:
+                    fill_wavefront(x, y, matrix, steps)
+                matrix.values.setflags(write=False)
+                self.__matrix, self.__steps = matrix, steps
+            return self.__matrix
+
+    def __accumulated_distance(self):
+        """
+        Method to get the last cell of a matrix. If a matrix is not filled yet, only rolling rows or anti-diagonals
+        are kept in memory, so the memory is linear instead of quadratic.
+        :return: value of the last cell of a matrix.
         """
         x, y = self.x, self.y
-        rows, cols = len(x) + 1, len(y) + 1
-        matrix = np.zeros([rows, cols])
-        matrix[0, 1:], matrix[1:, 0], matrix[0, 0] = np.inf, np.inf, 0
-        return matrix
+        with self.__lock:
+            if self.__matrix is not None:
+                return self.__matrix[len(x), len(y)]
+            # a warping path starts at the last cell
+            if self.__result is not None and self.__result.path_costs:
+                return self.__result.path_costs[0]
+            if self.__distance is None and self.cache is not None:
+                cached = self.cache.get(self.__cache_key("distance"))
+                if cached is not None:
+                    self.__distance = cached["distance"][()]
+            if self.__distance is None:
+                if self.engine == "loop":
+                    kernel, swap = distance_loop, len(y) > len(x)
+                else:
+                    kernel, swap = distance_wavefront, len(x) > len(y)
+                # without a constraint the last cell is the same for swapped signals, so the shorter one sets memory
+                if self.constraint is None and swap:
+                    x, y = y, x
+                lo, hi = self.__bounds(x, y)
+                self.__distance = kernel(x, y, lo, hi)
+                if self.cache is not None:
+                    self.cache.put(self.__cache_key("distance"), distance=self.__distance)
+            return self.__distance
 
     def fill_matrix(self):
         """
         Method to fill a matrix.
-        :return: filled matrix.
+        :return: filled matrix (read-only), cells outside a global constraint are infinite. With the tiled engine a
+                 matrix without a constraint is a memory-mapped array read from disk on access.
         """
-        x, y = self.x, self.y
-        matrix = self.__initialize_matrix()
-        rows, cols = np.shape(matrix)
-        for i in range(1, rows):
-            for j in range(1, cols):
-                distance = abs(x[i - 1] - y[j - 1])
-                component = np.min([matrix[i - 1][j - 1], matrix[i - 1][j], matrix[i][j - 1]])
-                matrix[i][j] = distance + component
-        return matrix
-
-    def __init_global_variables(self, i, j):
-        """
-        Method to initialize global variables.
-        :param i: number of rows in a matrix.
-        :param j: number of columns in a matrix.
-        :return: initialized global variables.
-        """
-        self.__cost_matrix = self.fill_matrix()
-        self.__matches, self.__insertions, self.__deletions = 0, 0, 0
-        self.__path = [(i - 1, j - 1)]
+        return self.__fill().to_dense()
+
+    @property
+    def result(self):
+        """
+        Method to get a result of DTW shared by all cost methods, statistics and plots. It is computed only once.
+        :return: result as DTWResult object.
+        """
+        with self.__lock:
+            if self.__result is None and self.cache is not None:
+                cached = self.cache.get(self.__cache_key("result"))
+                if cached is not None:
+                    self.__result = DTWResult(cached["path"], cached["path_costs"], *cached["statistics"].tolist())
+            if self.__result is None:
+                x, y = self.x, self.y
+                if self.path == "linear" and self.__matrix is None:
+                    lo, hi = self.__bounds(x, y)
+                    self.__result = DTWResult(*trace_path_linear(x, y, lo, hi))
+                else:
+                    matrix = self.__fill()
+                    self.__result = DTWResult(*trace_path(matrix, self.__steps), matrix=matrix)
+                if self.cache is not None:
+                    self.cache.put(self.__cache_key("result"), path=self.__result.path,
+                                   path_costs=np.array(self.__result.path_costs, dtype=self.dtype),
+                                   statistics=np.array(self.__result.statistics))
+            return self.__result
 
     def traceback(self):
         """
-        Method get traceback matrix.
+        Method get traceback matrix. With the tiled engine the matrix is stored on disk, as the accumulated cost one.
         :return: traceback matrix.
         """
-        x, y = self.x, self.y
-        i, j = rows, cols = len(x), len(y)
-        self.__init_global_variables(i, j)
-        traceback_matrix = np.zeros([rows + 1, cols + 1])
-        cost_matrix = self.__cost_matrix
-        while i > 0 and j > 0:
-            score = cost_matrix[i][j]
-            distance = abs(x[i - 1] - y[j - 1])
-            match, insertion, deletion = [cost_matrix[i - 1][j - 1],
-                                          cost_matrix[i - 1][j],
-                                          cost_matrix[i][j - 1]]
-            if score == distance + match:
-                traceback_matrix[i][j] = 1
-                self.__matches += 1
-                i -= 1
-                j -= 1
-            elif score == distance + insertion:
-                traceback_matrix[i][j] = 1
-                self.__insertions += 1
-                i -= 1
-            else:
-                traceback_matrix[i][j] = 1
-                self.__deletions += 1
-                j -= 1
-            self.__path.append((i - 1, j - 1))
+        path = self.result.path
+        traceback_matrix = full([len(self.x) + 1, len(self.y) + 1], 0.0, on_disk=self.engine == "tiled")
+        traceback_matrix[path[:, 0] + 1, path[:, 1] + 1] = 1
         return traceback_matrix
 
     def get_statistics(self):
@@ -121,8 +253,7 @@ class DTW:
         Method to get statistics of DTW.
         :return: number of matches, insertions and deletions.
         """
-        self.traceback()
-        return self.__matches, self.__insertions, self.__deletions
+        return self.result.statistics
 
     def calc_alignment_cost(self, method):
         """
@@ -140,25 +271,58 @@ class DTW:
             raise ValueError(f"Allowed methods to calculate alignment cost are: 'd-method', 'td-method' and "
                              f"'c-method'. Got '{method}' instead.")
 
+    def calc_alignment_costs(self):
+        """
+        Method to calculate alignment cost using all methods from one filled matrix and one warping path.
+        :return: alignment costs as a structured array with fields 'd-method', 'td-method' and 'c-method'.
+        """
+        # a path is needed anyway, so a distance is read from its first cell
+        self.result
+        costs = tuple(self.calc_alignment_cost(method=method) for method in ALIGNMENT_METHODS)
+        return np.array(costs, dtype=ALIGNMENT_COSTS_DTYPE)
+
+    def calc_bounded_alignment_cost(self, max_cost):
+        """
+        Method to calculate alignment cost using the distance method, skipping the calculation when a lower bound of
+        the cost (LB_Kim or LB_Keogh) is greater than a maximum cost, and abandoning it as soon as the cost of every
+        warping path is greater. A distance which is not abandoned is kept, so later alignment costs using the distance
+        method are not computed again. With a cache or a result already computed the cost is found as in
+        calc_alignment_cost().
+        :param max_cost: maximum alignment cost.
+        :return: alignment cost, infinite if the calculation was skipped or abandoned.
+        """
+        x, y = self.x, self.y
+        n, m = len(x), len(y)
+        with self.__lock:
+            computed = self.__matrix is not None or self.__result is not None or self.__distance is not None
+            if not computed and self.cache is None and n and m:
+                # bounds of a band of a constraint hold for a band of FastDTW too, as it lies inside the whole matrix
+                bound, x_terms, y_terms = lower_bounds(x, y, *self.__envelope_bounds(n, m), multivariate=x.ndim > 1)
+                if bound / (n + m) > max_cost:
+                    return np.inf
+                kernel = distance_loop if self.engine == "loop" else distance_wavefront
+                limit = max_cost * (n + m) * (1 + relative_tolerance(self.dtype, n + m))
+                distance = kernel(x, y, *self.__bounds(x, y), limit, remaining_bounds(x_terms, y_terms))
+                if distance < np.inf:
+                    self.__distance = distance
+                return distance / (n + m)
+        return self.__use_distance_method()
+
     def __use_distance_method(self):
         """
         Method to calculate alignment cost using the distance method.
         :return: alignment cost.
         """
-        matrix = self.fill_matrix()[1:, 1:]
-        n, m = np.shape(matrix)
-        return matrix[n - 1][m - 1] / (n + m)
+        n, m = len(self.x), len(self.y)
+        return self.__accumulated_distance() / (n + m)
 
     def __use_time_distance_method(self):
         """
         Method to calculate alignment cost using the time-distance method.
         :return: alignment cost.
         """
-        self.traceback()
-        matrix = self.__cost_matrix[1:, 1:]
-        cost = sum(matrix[n, m] for n, m in self.__path[:-1])
-        len_traceback = len(self.__path[:-1])
-        return cost / len_traceback
+        path_costs = self.result.path_costs
+        return sum(path_costs) / len(path_costs)
 
     def __use_cost_method(self):
         """
@@ -169,86 +333,645 @@ class DTW:
         len_traceback = matches + insertions + deletions
         return (insertions + deletions) / len_traceback
 
-    def sliding_window_dtw(self, window_size, step, method):
+    @staticmethod
+    def __check_window_params(window_size, step, method=None):
         """
-        Method to implement DTW with sliding window.
+        Method to check params of DTW with sliding window.
         :param window_size: size of a window.
         :param step: step between windows.
-        :param method: method to calculate alignment cost.
-        :return: list with alignment costs per window and the list with analyzed windows.
+        :param method: method to calculate alignment cost, 'all' for all methods at once, None not to check it.
+        :raise ValueError: if a window is too small, a step is not positive or a method is unknown.
         """
         if window_size < 5:
             raise ValueError("Window is not big enough!")
         if step <= 0:
             raise ValueError("Step must have a positive value!")
+        if method is not None and method != "all" and method not in ALIGNMENT_METHODS:
+            raise ValueError(f"Allowed methods to calculate alignment cost are: 'd-method', 'td-method' and "
+                             f"'c-method'. Got '{method}' instead.")
+
+    def __envelope_bounds(self, n, m):
+        """
+        Method to get a band of a matrix of signals of given lengths for their lower bounds, shared by all windows of
+        these lengths. A band of FastDTW depends on samples of signals, but it lies inside the whole matrix.
+        :param n: length of the first signal.
+        :param m: length of the second signal.
+        :return: first allowed column and column after the last allowed one for each row of a matrix.
+        """
+        if self.constraint == "fastdtw":
+            return band_bounds(n, m, None)
+        return band_bounds(n, m, self.constraint, self.radius, self.slope, self.lag)
+
+    def __group_windows(self, starts, window_size):
+        """
+        Method to group windows by their lengths, windows at the end of a shorter signal are shorter.
+        :param starts: first samples of windows.
+        :param window_size: size of a window.
+        :return: dictionary with positions of windows on the list of first samples by lengths of windows of both
+                 signals.
+        """
+        groups = {}
+        for pos, i in enumerate(starts):
+            groups.setdefault((len(self.x[i:i + window_size]), len(self.y[i:i + window_size])), []).append(pos)
+        return groups
+
+    def __window_dtw(self, start, stop):
+        """
+        Method to create DTW for a window of signals with the same settings. Matrices of windows fit in memory, so
+        the tiled engine is replaced by the wavefront one, which gives the same results.
+        :param start: first sample of a window.
+        :param stop: sample after the last one of a window.
+        :return: DTW object for a window.
+        """
+        engine = "wavefront" if self.engine == "tiled" else self.engine
+        return DTW(self.x[start:stop], self.y[start:stop], engine=engine, constraint=self.constraint,
+                   radius=self.radius, slope=self.slope, path=self.path, dtype=self.dtype, lag=self.lag)
+
+    @staticmethod
+    def __batch_costs(matrices, steps, method):
+        """
+        Method to calculate alignment costs of many windows of the same size at once.
+        :param matrices: filled matrices of windows.
+        :param steps: steps chosen while filling matrices of windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :return: alignment costs of windows as an array (a structured array for method='all').
+        """
+        n, m = matrices.shape[1] - 1, matrices.shape[2] - 1
+        costs = np.zeros(len(matrices), dtype=ALIGNMENT_COSTS_DTYPE)
+        costs["d-method"] = matrices[:, n, m] / (n + m)
+        if method != "d-method":
+            path_costs, len_traceback, matches, insertions, deletions = trace_paths_batch(matrices, steps)
+            costs["td-method"] = path_costs / len_traceback
+            costs["c-method"] = (insertions + deletions) / len_traceback
+        if method == "all":
+            return costs
+        return costs[method]
+
+    def __iter_window_batches(self, window_size, step, method, matrix_dtype, matrices, starts=None):
+        """
+        Method to implement DTW with sliding window, computing consecutive windows of the same size at once. Windows
+        are stacked into an array and the recurrence is vectorized over them, so results are exactly equal to the ones
+        computed window by window. At most BATCH_CELLS cells are kept in memory.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param matrix_dtype: type of yielded matrices of windows.
+        :param matrices: whether to yield matrices of windows.
+        :param starts: first samples of computed windows, all windows by default.
+        :return: generator of analyzed windows, alignment costs and matrices of windows.
+        """
         x, y = self.x, self.y
+        if starts is None:
+            starts = range(0, max(len(x), len(y)) - window_size + 1, step)
+        size = max(BATCH_CELLS // ((window_size + 1) * (window_size + 1)), 1)
+        for k in range(0, len(starts), size):
+            chunk_starts = starts[k:k + size]
+            for (n, m), positions in self.__group_windows(chunk_starts, window_size).items():
+                chunk = [chunk_starts[pos] for pos in positions]
+                if n == 0 or m == 0:
+                    for i in chunk:
+                        yield self.__window_result(self.__window_dtw(i, window_size + i), [i, window_size + i],
+                                                   method, matrix_dtype, matrices)
+                    continue
+                lo, hi = band_bounds(n, m, self.constraint, self.radius, self.slope, self.lag)
+                x_batch = np.stack([x[i:i + n] for i in chunk])
+                y_batch = np.stack([y[i:i + m] for i in chunk])
+                batch = np.full([len(chunk), n + 1, m + 1], np.inf, dtype=self.dtype)
+                batch[:, 0, 0] = 0
+                steps = np.full(batch.shape, -1, dtype=np.int8) if method != "d-method" else None
+                fill_block_wavefront(x_batch, y_batch, batch, lo, hi, steps, multivariate=x.ndim > 1)
+                alignment_costs = self.__batch_costs(batch, steps, method)
+                stored = batch[:, 1:, 1:].astype(matrix_dtype, copy=False) if matrices else None
+                if matrices:
+                    stored.setflags(write=False)
+                for pos, i in enumerate(chunk):
+                    yield [i, window_size + i], alignment_costs[pos], stored[pos] if matrices else None
+
+    def iter_sliding_window_dtw(self, window_size, step, method, batch=False, matrix_dtype=np.float32, matrices=True,
+                                prefilter=None):
+        """
+        Method to implement DTW with sliding window, yielding results of windows one by one as they are computed, so
+        memory does not grow with the length of signals.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param batch: whether to compute consecutive windows at once instead of window by window. Bands of FastDTW
+                      differ between windows, so with FastDTW windows are always computed one by one.
+        :param matrix_dtype: type of yielded matrices of windows, float32 by default to halve memory. Costs are
+                             calculated before matrices are converted.
+        :param matrices: whether to yield matrices of windows. Without them the distance method needs no full matrix.
+                         With a cache alignment costs of all methods are read from it or stored in it at once, while
+                         matrices are not stored, so with a cached result only matrices are filled again. The cost
+                         of the distance method is read from a filled matrix, so with matrices it gains nothing.
+        :param prefilter: Prefilter object choosing windows computed exactly by lower bounds of their costs from
+                          reduced signals, None to compute all windows. Other windows have infinite costs and no
+                          matrices, and a cache is not used.
+        :return: generator of analyzed windows, alignment costs (a structured record for method='all') and matrices of
+                 windows (None if matrices=False).
+        """
+        self.__check_window_params(window_size, step, method)
+        if prefilter is not None:
+            yield from self.__iter_prefiltered_windows(window_size, step, method, batch, matrix_dtype, matrices,
+                                                       prefilter)
+            return
+        if self.cache is None:
+            yield from self.__iter_windows(window_size, step, method, batch, matrix_dtype, matrices)
+            return
+        key = self.__cache_key("windows", window_size=window_size, step=step)
+        cached = self.cache.get(key)
+        if cached is None:
+            # costs of all methods are stored, so changing a method does not need a new calculation
+            starts, alignment_costs = [], []
+            for window, alignment_cost, matrix in self.__iter_windows(window_size, step, "all", batch, matrix_dtype,
+                                                                      matrices):
+                starts.append(window[0])
+                alignment_costs.append(alignment_cost)
+                yield window, alignment_cost if method == "all" else alignment_cost[method], matrix
+            self.cache.put(key, starts=np.array(starts, dtype=np.int64),
+                           alignment_costs=np.array(alignment_costs, dtype=ALIGNMENT_COSTS_DTYPE))
+            return
+        # matrices are not stored, so only they are filled again, without warping paths of the other methods
+        computed = (self.__iter_windows(window_size, step, "d-method", batch, matrix_dtype, True) if matrices
+                    else None)
+        for i, alignment_cost in zip(cached["starts"].tolist(), cached["alignment_costs"]):
+            matrix = next(computed)[2] if matrices else None
+            yield [i, window_size + i], alignment_cost if method == "all" else alignment_cost[method], matrix
+
+    def calc_lower_bound(self, prefilter):
+        """
+        Method to calculate a lower bound of alignment cost using the distance method from reduced signals.
+        :param prefilter: Prefilter object with params of reduced signals.
+        :return: lower bound of alignment cost.
+        """
+        x, y = self.x, self.y
+        n, m = len(x), len(y)
+        if n == 0 or m == 0:
+            return 0.0
+        lo, hi = self.__envelope_bounds(n, m)
+        bound = prefilter.lower_bounds(x, y, lo, hi, prefilter.breakpoints(x, y), multivariate=x.ndim > 1)
+        return float(bound) / (n + m)
+
+    def __prefiltered_windows(self, window_size, step, prefilter):
+        """
+        Method to choose windows computed exactly by a prefilter. Bounds of windows of the same size are computed at
+        once, with breakpoints of symbols of whole signals.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param prefilter: Prefilter object.
+        :return: dictionary with DTW objects of chosen windows by their first samples, None for windows whose costs
+                 were not computed while choosing them.
+        """
+        x, y = self.x, self.y
+        starts = list(range(0, max(len(x), len(y)) - window_size + 1, step))
+        breakpoints = prefilter.breakpoints(x, y)
+        bounds = np.zeros(len(starts))
+        for (n, m), positions in self.__group_windows(starts, window_size).items():
+            if n == 0 or m == 0:
+                continue
+            lo, hi = self.__envelope_bounds(n, m)
+            x_batch = np.stack([x[starts[pos]:starts[pos] + n] for pos in positions])
+            y_batch = np.stack([y[starts[pos]:starts[pos] + m] for pos in positions])
+            bounds[positions] = prefilter.lower_bounds(x_batch, y_batch, lo, hi, breakpoints,
+                                                       multivariate=x.ndim > 1) / (n + m)
+
+        # windows computed while choosing them are kept, so chosen ones are not computed again
+        dtws = {}
+
+        def cost(positions, limit):
+            for pos in positions:
+                dtws[pos] = self.__window_dtw(starts[pos], starts[pos] + window_size)
+            return [dtws[pos].calc_bounded_alignment_cost(limit) for pos in positions]
+
+        return {starts[pos]: dtws.get(pos) for pos in prefilter.select(bounds, cost)}
+
+    def __iter_prefiltered_windows(self, window_size, step, method, batch, matrix_dtype, matrices, prefilter):
+        """
+        Method to implement DTW with sliding window only for windows chosen by a prefilter, yielding all windows in
+        their order.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param batch: whether to compute consecutive chosen windows at once instead of window by window.
+        :param matrix_dtype: type of yielded matrices of windows.
+        :param matrices: whether to yield matrices of windows.
+        :param prefilter: Prefilter object.
+        :return: generator of analyzed windows, alignment costs and matrices of windows, infinite costs and no
+                 matrices for windows not chosen.
+        """
+        chosen = self.__prefiltered_windows(window_size, step, prefilter)
+        computed = self.__iter_windows(window_size, step, method, batch, matrix_dtype, matrices,
+                                       [i for i, dtw in chosen.items() if dtw is None])
+        skipped = (np.array((np.inf,) * len(ALIGNMENT_METHODS), dtype=ALIGNMENT_COSTS_DTYPE) if method == "all"
+                   else np.inf)
+        for i in range(0, max(len(self.x), len(self.y)) - window_size + 1, step):
+            if i not in chosen:
+                yield [i, window_size + i], skipped, None
+            elif chosen[i] is None:
+                yield next(computed)
+            else:
+                yield self.__window_result(chosen[i], [i, window_size + i], method, matrix_dtype, matrices)
+
+    @staticmethod
+    def __window_result(dtw, window, method, matrix_dtype, matrices):
+        """
+        Method to get results of a window computed by its own DTW object.
+        :param dtw: DTW object of a window.
+        :param window: first sample of a window and sample after the last one.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param matrix_dtype: type of a yielded matrix of a window.
+        :param matrices: whether to yield a matrix of a window.
+        :return: analyzed window, alignment cost and matrix of a window (None if matrices=False).
+        """
+        # a matrix is filled first, so the distance method reads its last cell instead of computing it again
+        matrix = dtw.fill_matrix()[1:, 1:].astype(matrix_dtype, copy=False) if matrices else None
+        alignment_cost = dtw.calc_alignment_costs() if method == "all" else dtw.calc_alignment_cost(method=method)
+        return window, alignment_cost, matrix
+
+    def __iter_windows(self, window_size, step, method, batch, matrix_dtype, matrices, starts=None):
+        """
+        Method to implement DTW with sliding window, yielding results of windows one by one as they are computed.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param batch: whether to compute consecutive windows at once instead of window by window.
+        :param matrix_dtype: type of yielded matrices of windows.
+        :param matrices: whether to yield matrices of windows.
+        :param starts: first samples of computed windows, all windows by default.
+        :return: generator of analyzed windows, alignment costs and matrices of windows.
+        """
+        if batch and self.constraint != "fastdtw":
+            yield from self.__iter_window_batches(window_size, step, method, matrix_dtype, matrices, starts)
+            return
+        x, y = self.x, self.y
+        if starts is None:
+            starts = range(0, max(len(x), len(y)) - window_size + 1, step)
+        for i in starts:
+            yield self.__window_result(self.__window_dtw(i, window_size + i), [i, window_size + i], method,
+                                       matrix_dtype, matrices)
+
+    def sliding_window_dtw(self, window_size, step, method, batch=False, matrix_dtype=np.float32, prefilter=None):
+        """
+        Method to implement DTW with sliding window.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param batch: whether to compute consecutive windows at once instead of window by window. Bands of FastDTW
+                      differ between windows, so with FastDTW windows are always computed one by one.
+        :param matrix_dtype: type of stored matrices of windows, float32 by default to halve memory. Costs are
+                             calculated before matrices are converted.
+        :param prefilter: Prefilter object choosing windows computed exactly, None to compute all windows. Other
+                          windows have infinite costs and no matrices (None).
+        :return: list with alignment costs per window (a structured array for method='all'), the list with analyzed
+                 windows and the list with matrices of windows.
+        """
         alignment_costs, windows, alignment_matrices = [], [], []
-        for i in range(0, max(len(x), len(y)) - window_size + 1, step):
-            window = [i, window_size + i]
-            dtw = DTW(x[window[0]:window[1]], y[window[0]:window[1]])
-            alignment_matrices.append(dtw.fill_matrix()[1:, 1:])
-            alignment_cost = dtw.calc_alignment_cost(method=method)
+        for window, alignment_cost, matrix in self.iter_sliding_window_dtw(window_size, step, method, batch,
+                                                                           matrix_dtype, prefilter=prefilter):
             windows.append(window)
             alignment_costs.append(alignment_cost)
+            alignment_matrices.append(matrix)
+        if method == "all":
+            alignment_costs = np.array(alignment_costs, dtype=ALIGNMENT_COSTS_DTYPE)
         return alignment_costs, windows, alignment_matrices
 
-    def __perform_dtw_window(self, windows, pos, filename=None):
+    def find_subsequences(self, k=1, max_cost=np.inf):
+        """
+        Method to find spans of the second signal most similar to the whole first one (subsequence DTW), e.g. a
+        template episode in a long recording, in one pass over the second signal instead of windows of all sizes at all
+        offsets. A global constraint and a lag are not used, a warping path may start and end at any sample.
+        :param k: maximum number of spans, spans do not overlap.
+        :param max_cost: maximum cost of a span, infinite by default.
+        :return: structured array with the first sample, the sample after the last one and the cost of spans of the
+                 second signal, from the cheapest one. A cost is the DTW distance of the first signal and a span.
+        """
+        return find_subsequences(self.x, self.y, k=k, max_cost=max_cost)
+
+    @classmethod
+    def pair_grid(cls, xs, ys, window_size, step, method, pairs=None, var=None, constraint=None, radius=None,
+                  slope=None, dtype=float, cache=None, prefilter=None):
+        """
+        Method to implement DTW with sliding window for many pairs of series at once. Every series is transformed and
+        cut into windows only once, and windows of all pairs are stacked into arrays and computed by one vectorized
+        recurrence, so results are exactly equal to the ones of sliding_window_dtw() for each pair.
+        :param xs: first series by their names, e.g. a dictionary or a DataFrame.
+        :param ys: second series by their names, e.g. a dictionary or a DataFrame.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+        :param pairs: list of (x name, y name) pairs, by default every first series with every second one.
+        :param var: variant of DTW, classic (None) or derivative (DDTW).
+        :param constraint: global constraint, none (None), Sakoe-Chiba band (sakoe-chiba) or Itakura parallelogram
+                           (itakura).
+        :param radius: radius of the Sakoe-Chiba band in samples.
+        :param slope: maximum slope of the Itakura parallelogram.
+        :param dtype: type of series and cells of matrices, float (float64) or float32.
+        :param cache: ResultCache object to read and store alignment costs of all methods of a grid in, None not to
+                      use a cache.
+        :param prefilter: Prefilter object choosing windows of each pair computed exactly as in sliding_window_dtw(),
+                          None to compute all windows. Other windows have infinite costs, and a cache is not used.
+        :return: table with analyzed windows and alignment costs of pairs in columns named 'x name-y name' (a
+                 dictionary with a table for each method for method='all').
+        """
+        cls.__check_window_params(window_size, step, method)
+        if constraint == "fastdtw":
+            raise ValueError("Bands of FastDTW differ between pairs, so they cannot be computed at once!")
+        if var not in (None, "DDTW"):
+            raise ValueError("Allowed variants of DTW: classic (var=None), derivative (var=DDTW).")
+        if np.dtype(dtype) not in DTYPES:
+            raise ValueError(f"Allowed types of a matrix are float32 and float64. Got '{np.dtype(dtype)}' instead.")
+        if pairs is None:
+            pairs = [(x_name, y_name) for x_name in xs for y_name in ys]
+        names = list(dict.fromkeys([("x", x_name) for x_name, _ in pairs] + [("y", y_name) for _, y_name in pairs]))
+        # each series is transformed only once, however many pairs it belongs to
+        series = [np.array(xs[name] if side == "x" else ys[name]) for side, name in names]
+        if len({len(s) for s in series}) > 1:
+            raise ValueError("All series of a grid must have the same length!")
+        series = np.stack([cls.derivative_signal(s) if var == "DDTW" else s for s in series]).astype(dtype)
+        windows = [[i, window_size + i] for i in range(0, series.shape[1] - window_size + 1, step)]
+        if prefilter is not None:
+            cache = None
+        # with a cache costs of all methods are stored, so changing a method does not need a new calculation
+        computed = "all" if cache is not None else method
+        key, cached = None, None
+        if cache is not None:
+            key = ResultCache.key([series], operation="grid", names=names, pairs=list(pairs), window_size=window_size,
+                                  step=step, constraint=constraint, radius=radius, slope=slope)
+            cached = cache.get(key)
+        alignment_costs = np.zeros(len(pairs) * len(windows),
+                                   dtype=ALIGNMENT_COSTS_DTYPE if computed == "all" else float)
+        if cached is not None:
+            alignment_costs = cached["alignment_costs"]
+        elif windows:
+            # windows of each series are strided views, copied only for a computed chunk
+            series_windows = np.lib.stride_tricks.sliding_window_view(series, window_size, axis=1)[:, ::step]
+            x_index = np.repeat([names.index(("x", x_name)) for x_name, _ in pairs], len(windows))
+            y_index = np.repeat([names.index(("y", y_name)) for _, y_name in pairs], len(windows))
+            window_index = np.tile(np.arange(len(windows)), len(pairs))
+            lo, hi = band_bounds(window_size, window_size, constraint, radius, slope)
+            positions = np.arange(len(alignment_costs))
+            if prefilter is not None:
+                alignment_costs[:] = (np.inf,) * len(ALIGNMENT_METHODS) if computed == "all" else np.inf
+                chosen = cls.__prefiltered_grid(series, series_windows, x_index[::len(windows)],
+                                                y_index[::len(windows)], lo, hi, prefilter, constraint=constraint,
+                                                radius=radius, slope=slope, dtype=dtype)
+                # distances of windows computed while choosing them are kept by their DTW objects
+                for pos, dtw in chosen.items():
+                    if dtw is not None and computed == "d-method":
+                        alignment_costs[pos] = dtw.calc_alignment_cost(method="d-method")
+                positions = np.array([pos for pos, dtw in chosen.items() if dtw is None or computed != "d-method"],
+                                     dtype=np.int64)
+            size = max(BATCH_CELLS // ((window_size + 1) * (window_size + 1)), 1)
+            for k in range(0, len(positions), size):
+                chunk = positions[k:k + size]
+                x_batch = series_windows[x_index[chunk], window_index[chunk]]
+                y_batch = series_windows[y_index[chunk], window_index[chunk]]
+                matrices = np.full([len(x_batch), window_size + 1, window_size + 1], np.inf, dtype=series.dtype)
+                matrices[:, 0, 0] = 0
+                steps = np.full(matrices.shape, -1, dtype=np.int8) if computed != "d-method" else None
+                fill_block_wavefront(x_batch, y_batch, matrices, lo, hi, steps)
+                alignment_costs[chunk] = cls.__batch_costs(matrices, steps, computed)
+        if cache is not None and cached is None:
+            cache.put(key, alignment_costs=alignment_costs)
+        alignment_costs = alignment_costs.reshape(len(pairs), len(windows))
+        tables = {}
+        for cost_method in (ALIGNMENT_METHODS if method == "all" else (method,)):
+            data = {"Window": windows}
+            costs = alignment_costs[cost_method] if computed == "all" else alignment_costs
+            for p, (x_name, y_name) in enumerate(pairs):
+                data[f"{x_name}-{y_name}"] = costs[p]
+            tables[cost_method] = pd.DataFrame(data)
+        return tables if method == "all" else tables[method]
+
+    @classmethod
+    def __prefiltered_grid(cls, series, series_windows, x_series, y_series, lo, hi, prefilter, **params):
+        """
+        Method to choose windows of pairs of a grid computed exactly by a prefilter, separately for each pair as in
+        sliding_window_dtw(). Bounds of all windows of a pair are computed at once, with breakpoints of symbols of
+        whole series.
+        :param series: transformed series of a grid.
+        :param series_windows: windows of each series.
+        :param x_series: position of the first series of each pair.
+        :param y_series: position of the second series of each pair.
+        :param lo: first allowed column for each row of a matrix of a window.
+        :param hi: column after the last allowed one for each row of a matrix of a window.
+        :param prefilter: Prefilter object.
+        :param params: params of DTW objects of windows.
+        :return: dictionary with DTW objects of chosen windows by their positions in a grid, None for windows whose
+                 costs were not computed while choosing them.
+        """
+        count, window_size = series_windows.shape[1], series_windows.shape[2]
+        chosen = {}
+        for p, (i, j) in enumerate(zip(x_series.tolist(), y_series.tolist())):
+            bounds = prefilter.lower_bounds(series_windows[i], series_windows[j], lo, hi,
+                                            prefilter.breakpoints(series[i], series[j])) / (2 * window_size)
+            dtws = {}
+
+            def cost(positions, limit):
+                for pos in positions:
+                    dtws[pos] = cls(series_windows[i, pos], series_windows[j, pos], **params)
+                return [dtws[pos].calc_bounded_alignment_cost(limit) for pos in positions]
+
+            for pos in prefilter.select(bounds, cost):
+                chosen[p * count + pos] = dtws.get(pos)
+        return chosen
+
+    def __perform_dtw_window(self, window, filename=None):
         """
         Method to perform DTW on a specific window.
-        :param windows: list of analyzed windows.
-        :param pos: index of a specific window from the list.
+        :param window: first sample of a window and sample after the last one.
         :param filename: name of a file to save plots.
         """
-        dtw = DTW(self.x[windows[pos][0]:windows[pos][1]], self.y[windows[pos][0]:windows[pos][1]])
-        dtw.traceback()
+        dtw = self.__window_dtw(*window)
         dtw.__make_plots(x_signal='x', y_signal='y', filename=filename)
 
-    def __get_min_max_alignment_cost(self, min_max, window_size, step, method):
+    def __window_bounds(self, min_max, window_size, step):
+        """
+        Method to calculate bounds of alignment costs of all windows using the distance method.
+        :param min_max: MIN/MAX, whether to calculate lower or upper bounds.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :return: list with analyzed windows and array with bounds of alignment costs per window.
+        """
+        x, y = self.x, self.y
+        starts = list(range(0, max(len(x), len(y)) - window_size + 1, step))
+        windows = [[i, window_size + i] for i in starts]
+        bounds = np.zeros(len(starts))
+        for (n, m), positions in self.__group_windows(starts, window_size).items():
+            if n == 0 or m == 0:
+                # a window without samples of a signal has no warping path, so its cost is computed directly
+                bounds[positions] = -np.inf if min_max == "MIN" else np.inf
+                continue
+            x_batch = np.stack([x[starts[pos]:starts[pos] + n] for pos in positions])
+            y_batch = np.stack([y[starts[pos]:starts[pos] + m] for pos in positions])
+            if min_max == "MIN":
+                # envelopes of all windows are computed at once with the band shared by windows of the same size
+                lo, hi = self.__envelope_bounds(n, m)
+                bounds[positions] = lower_bounds(x_batch, y_batch, lo, hi, multivariate=x.ndim > 1)[0]
+            elif self.constraint == "fastdtw" or self.lag:
+                # a band of FastDTW or an offset band may not contain the diagonal path
+                bounds[positions] = np.inf
+            else:
+                bounds[positions] = upper_bounds(x_batch, y_batch, multivariate=x.ndim > 1)
+            bounds[positions] /= n + m
+        return windows, bounds
+
+    def __search_min_max_alignment_cost(self, min_max, window_size, step, alignment_costs=None, tolerance=0):
+        """
+        Method to get minimum or maximum alignment cost using the distance method without computing DTW for all
+        windows. Windows are visited from the most promising bound and the search stops when the bound of the next
+        window is worse than the best cost. Looking for minimum, a calculation of a window is also abandoned when its
+        partial cost together with a lower bound of the rest of a path exceeds the best one. Skipped windows are
+        strictly worse, so the result is the same as from all windows.
+        :param min_max: MIN/MAX, whether to look for minimum or maximum value.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param alignment_costs: dictionary with alignment costs of windows already computed by their positions, the
+                                best of them is a starting point of a search.
+        :param tolerance: relative tolerance of the result, windows are skipped also when they may be better than the
+                          best cost, but by less than this tolerance. The exact result for 0.
+        :return: minimum or maximum alignment cost, the list with analyzed windows and positions of windows with
+                 minimum or maximum alignment cost.
+        """
+        windows, bounds = self.__window_bounds(min_max, window_size, step)
+        sign = 1 if min_max == "MIN" else -1
+        alignment_costs = {} if alignment_costs is None else dict(alignment_costs)
+        best = min(alignment_costs.values(), key=lambda cost: sign * cost, default=sign * np.inf)
+        # a bound of the cost of a window, i.e. the lower bound for minimum, and the upper bound for maximum
+        scale = 1 + tolerance if min_max == "MIN" else 1 / (1 + tolerance)
+        for pos in np.argsort(sign * bounds, kind="stable").tolist():
+            if sign * bounds[pos] * scale > sign * best:
+                break
+            if pos in alignment_costs:
+                continue
+            max_cost = best if min_max == "MIN" else np.inf
+            alignment_cost = self.__window_dtw(*windows[pos]).calc_bounded_alignment_cost(max_cost)
+            alignment_costs[pos] = alignment_cost
+            if sign * alignment_cost < sign * best:
+                best = alignment_cost
+        positions = [pos for pos, alignment_cost in alignment_costs.items() if alignment_cost == best]
+        return best, windows, np.array(sorted(positions), dtype=int)
+
+    def __coarse_to_fine_alignment_cost(self, min_max, window_size, step, method, coarse_step, candidates, tolerance):
+        """
+        Method to get minimum or maximum alignment cost computing DTW only for some windows. Windows every coarse step
+        are computed first, then all windows between neighbours of the best of them. Optionally, the best cost found
+        is a starting point of a search using bounds of alignment cost, which guarantees a relative tolerance of
+        the result.
+        :param min_max: MIN/MAX, whether to look for minimum or maximum value.
+        :param window_size: size of a window.
+        :param step: step between windows.
+        :param method: method to calculate alignment cost.
+        :param coarse_step: step between windows computed first, a multiple of a step.
+        :param candidates: number of the best windows computed first whose neighbourhoods are refined.
+        :param tolerance: relative tolerance of the result guaranteed by bounds, only for the distance method, None
+                          for no guarantee, i.e. the best window of refined neighbourhoods.
+        :return: minimum or maximum alignment cost and the list with windows with this cost.
+        """
+        if coarse_step <= 0 or coarse_step % step:
+            raise ValueError(f"Coarse step must be a positive multiple of a step! Got {coarse_step} instead.")
+        if candidates < 1:
+            raise ValueError("Number of candidates must be at least 1!")
+        if tolerance is not None and tolerance < 0:
+            raise ValueError("Tolerance must not be negative!")
+        x, y = self.x, self.y
+        windows = [[i, window_size + i] for i in range(0, max(len(x), len(y)) - window_size + 1, step)]
+        if not windows:
+            raise ValueError("There are no values to look for minimum or maximum in!")
+        alignment_costs = {}
+
+        def compute(positions):
+            for pos in positions:
+                if pos not in alignment_costs:
+                    alignment_costs[pos] = self.__window_dtw(*windows[pos]).calc_alignment_cost(method=method)
+
+        # the last window is computed as well, so no window is further than a coarse step from a computed one
+        ratio = coarse_step // step
+        compute(sorted(set(range(0, len(windows), ratio)) | {len(windows) - 1}))
+        sign = 1 if min_max == "MIN" else -1
+        for pos in sorted(alignment_costs, key=lambda pos: sign * alignment_costs[pos])[:candidates]:
+            compute(range(max(pos - ratio + 1, 0), min(pos + ratio, len(windows))))
+        if tolerance is not None:
+            alignment_cost, _, positions = self.__search_min_max_alignment_cost(min_max, window_size, step,
+                                                                                alignment_costs, tolerance)
+            return alignment_cost, [windows[pos] for pos in positions]
+        return streaming_extreme(((windows[pos], alignment_costs[pos]) for pos in sorted(alignment_costs)), min_max)
+
+    def __get_min_max_alignment_cost(self, min_max, window_size, step, method, prune=False, coarse_step=None,
+                                     candidates=3, tolerance=None):
         """
         Method to get minimum or maximum alignment cost from a list.
         :param min_max: MIN/MAX, whether to look for minimum or maximum value.
         :param window_size: size of a window.
         :param step: step between windows.
         :param method: method to calculate alignment cost.
-        :return: list with alignment costs per window and the list with analyzed windows, and position of a window with
-                 minimum or maximum alignment cost.
+        :param prune: whether to skip windows using bounds of alignment cost, only for the distance method.
+        :param coarse_step: step between windows computed first in the coarse-to-fine search, None to compute all
+                            windows.
+        :param candidates: number of the best windows computed first whose neighbourhoods are refined.
+        :param tolerance: relative tolerance of the result of the coarse-to-fine search guaranteed by bounds, only for
+                          the distance method, None for no guarantee.
+        :return: minimum or maximum alignment cost and the list with windows with this cost.
         """
-        alignment_costs, windows = self.sliding_window_dtw(window_size, step, method)
-        alignment_cost = 0
-        if min_max == "MIN":
-            alignment_cost = np.min(alignment_costs)
-        elif min_max == "MAX":
-            alignment_cost = np.max(alignment_costs)
-        return alignment_cost, windows, np.where(alignment_costs == alignment_cost)[0]
+        if (prune or tolerance is not None) and method != "d-method":
+            raise ValueError(f"Bounds of alignment cost are known only for 'd-method'. Got '{method}' instead.")
+        if coarse_step is not None:
+            if prune:
+                raise ValueError("Pruning is used by the coarse-to-fine search through its tolerance!")
+            self.__check_window_params(window_size, step)
+            return self.__coarse_to_fine_alignment_cost(min_max, window_size, step, method, coarse_step, candidates,
+                                                        tolerance)
+        if prune:
+            self.__check_window_params(window_size, step)
+            alignment_cost, windows, positions = self.__search_min_max_alignment_cost(min_max, window_size, step)
+            return alignment_cost, [windows[pos] for pos in positions]
+        # windows are computed one by one and only the current extreme is kept, so memory is constant
+        results = self.iter_sliding_window_dtw(window_size, step, method, matrices=False)
+        return streaming_extreme(((window, alignment_cost) for window, alignment_cost, _ in results), min_max)
 
-    def __get_min_alignment_cost(self, window_size, step, method, filename=None):
+    def __get_min_alignment_cost(self, window_size, step, method, filename=None, prune=False, coarse_step=None,
+                                 candidates=3, tolerance=None):
         """
         Method to get minimum alignment cost together with the plots.
         :param window_size: size of a window.
         :param step: step between windows.
         :param method: method to calculate alignment cost.
         :param filename: name of a file to save plots.
+        :param prune: whether to skip windows using bounds of alignment cost, only for the distance method.
+        :param coarse_step: step between windows computed first in the coarse-to-fine search, None to compute all
+                            windows.
+        :param candidates: number of the best windows computed first whose neighbourhoods are refined.
+        :param tolerance: relative tolerance of the result of the coarse-to-fine search guaranteed by bounds.
         :return: minimum alignment cost.
         """
-        alignment_cost, windows, positions = self.__get_min_max_alignment_cost(min_max="MIN", window_size=window_size,
-                                                                               step=step, method=method)
-        for position in positions:
-            self.__perform_dtw_window(windows, position, filename)
+        alignment_cost, windows = self.__get_min_max_alignment_cost(min_max="MIN", window_size=window_size, step=step,
+                                                                    method=method, prune=prune,
+                                                                    coarse_step=coarse_step, candidates=candidates,
+                                                                    tolerance=tolerance)
+        for window in windows:
+            self.__perform_dtw_window(window, filename)
         return alignment_cost
 
-    def __get_max_alignment_cost(self, window_size, step, method, filename=None):
+    def __get_max_alignment_cost(self, window_size, step, method, filename=None, prune=False, coarse_step=None,
+                                 candidates=3, tolerance=None):
         """
         Method to get maximum alignment cost together with the plots.
         :param window_size: size of a window.
         :param step: step between windows.
         :param method: method to calculate alignment cost.
         :param filename: name of a file to save plots.
+        :param prune: whether to skip windows using bounds of alignment cost, only for the distance method.
+        :param coarse_step: step between windows computed first in the coarse-to-fine search, None to compute all
+                            windows.
+        :param candidates: number of the best windows computed first whose neighbourhoods are refined.
+        :param tolerance: relative tolerance of the result of the coarse-to-fine search guaranteed by bounds.
         :return: maximum alignment cost.
         """
-        alignment_cost, windows, positions = self.__get_min_max_alignment_cost(min_max="MAX", window_size=window_size,
-                                                                               step=step, method=method)
-        for position in positions:
-            self.__perform_dtw_window(windows, position, filename)
+        alignment_cost, windows = self.__get_min_max_alignment_cost(min_max="MAX", window_size=window_size, step=step,
+                                                                    method=method, prune=prune,
+                                                                    coarse_step=coarse_step, candidates=candidates,
+                                                                    tolerance=tolerance)
+        for window in windows:
+            self.__perform_dtw_window(window, filename)
         return alignment_cost
 
     def __get_mean_alignment_cost(self, window_size, step, method):
@@ -259,10 +982,11 @@ class DTW:
         :param method: method to calculate alignment cost.
         :return: mean alignment cost.
         """
-        alignment_costs, windows = self.sliding_window_dtw(window_size, step, method)
-        return np.mean(alignment_costs)
+        results = self.iter_sliding_window_dtw(window_size, step, method, matrices=False)
+        return streaming_mean(alignment_cost for _, alignment_cost, _ in results)
 
-    def find_alignment_cost(self, method, look_for, window_size=10, step=1, filename=None):
+    def find_alignment_cost(self, method, look_for, window_size=10, step=1, filename=None, prune=False,
+                            coarse_step=None, candidates=3, tolerance=None):
         """
         Method to find minimum, maximum or mean alignment cost.
         :param method: method to calculate alignment cost.
@@ -270,15 +994,30 @@ class DTW:
         :param window_size: size of a window.
         :param step: step between windows.
         :param filename: name of a file to save plots.
+        :param prune: whether to skip windows looking for minimum (LB_Kim, LB_Keogh, early abandoning) or maximum
+                      (cost of the diagonal path) using bounds of alignment cost, only for the distance method. The
+                      result is the same.
+        :param coarse_step: step between windows computed first looking for minimum or maximum, a multiple of a step,
+                            None to compute all windows. Then all windows between neighbours of the best candidates are
+                            computed, so only about len / coarse_step + candidates * 2 * coarse_step / step windows are
+                            computed instead of len / step.
+        :param candidates: number of the best windows computed first whose neighbourhoods are refined.
+        :param tolerance: relative tolerance of the result of the coarse-to-fine search, only for the distance method.
+                          Windows which may still be better by more than this tolerance are found with bounds of
+                          alignment cost and computed, so the result is at most (1 + tolerance) times the minimum or
+                          at least the maximum divided by (1 + tolerance), and exact for 0. None for no guarantee,
+                          i.e. the best of computed windows, exact when the extreme lies next to the best candidates.
         :return: minimum, maximum or mean alignment cost.
         :raise ValueError: if value for look_for is not an expected one.
         """
         if look_for == "MEAN":
             return self.__get_mean_alignment_cost(window_size, step, method)
         elif look_for == "MIN":
-            return self.__get_min_alignment_cost(window_size, step, method, filename)
+            return self.__get_min_alignment_cost(window_size, step, method, filename, prune, coarse_step, candidates,
+                                                 tolerance)
         elif look_for == "MAX":
-            return self.__get_max_alignment_cost(window_size, step, method, filename)
+            return self.__get_max_alignment_cost(window_size, step, method, filename, prune, coarse_step, candidates,
+                                                 tolerance)
         else:
             raise ValueError(f"Allowed statistics are 'MIN', 'MAX' and 'MEAN'! Got {look_for} instead.")
 
@@ -335,19 +1074,29 @@ class DTW:
 
     def plot_cost_matrix(self, x_signal=None, y_signal=None, filename=None, ax=None):
         """
-        Method to plot a cost matrix.
+        Method to plot a cost matrix. A matrix with more than PLOT_CELLS rows or columns is plotted every few cells,
+        read directly from a stored band, so a full matrix is never created.
         :param x_signal: label for the x-signal.
         :param y_signal: label for the y-signal.
         :param filename: name of a file to save a plot.
+        :param ax: axes to draw a plot on, a new figure is shown if not given.
         """
         use_latex()
         label_pad = 8
-        matrix = self.fill_matrix()[1:, 1:]
-        if ax is None:
+        result = self.result
+        filled = self.__fill()
+        step = -(-max(filled.shape) // PLOT_CELLS)
+        rows, columns = np.arange(1, filled.shape[0], step), np.arange(1, filled.shape[1], step)
+        # cells outside a global constraint are not drawn
+        matrix = np.ma.masked_invalid(filled.take(rows[:, np.newaxis], columns[np.newaxis, :]))
+        show = ax is None
+        if show:
             fig, ax = plt.subplots()
-        c = ax.imshow(matrix, cmap=plt.get_cmap("Blues"), interpolation="nearest", origin="upper")
+        # plotted cells are placed at indices of signals
+        extent = (-step / 2, len(columns) * step - step / 2, len(rows) * step - step / 2, -step / 2)
+        c = ax.imshow(matrix, cmap=plt.get_cmap("Blues"), interpolation="nearest", origin="upper", extent=extent)
         plt.colorbar(c, ax=ax)
-        x_path, y_path = zip(*self.__path[:-1])
+        x_path, y_path = result.path[:, 0], result.path[:, 1]
         ax.plot(y_path, x_path, color="#003A7D", linewidth=1.5)
         ax.set_title("Macierz kosztów")
         ax.set_xlabel(f"{x_signal}", labelpad=label_pad)
@@ -355,6 +1104,8 @@ class DTW:
         ax.legend(['Ścieżka dopasowania'])
         if filename is not None:
             plt.savefig(f"{filename}.pdf", format='pdf')
+        if show:
+            plt.show()
 
     def plot_alignment(self, filename=None):
         """
@@ -363,7 +1114,7 @@ class DTW:
         """
         use_latex()
         x, y = self.x, self.y
-        for x_i, y_j in self.__path[:-1]:
+        for x_i, y_j in self.result.path:
             plt.plot([x_i, y_j], [x[x_i] + 1.5, y[y_j] - 1.5], c="C7")
         plt.plot(np.arange(x.shape[0]), x + 1.5, "-o", c="C3")
         plt.plot(np.arange(y.shape[0]), y - 1.5, "-o", c="C0")
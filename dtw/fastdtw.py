@@ -0,0 +1,68 @@
+"""
+@author: Radoslaw Plawecki
+Approximate DTW by multiresolution refinement of a band of the accumulated cost matrix.
+Sources:
+[1] Salvador, S., Chan, P. (2007). Toward accurate dynamic time warping in linear time and space. Intelligent Data
+Analysis, 11(5), 561-580.
+"""
+
+from project.dtw.band import BandedMatrix, _finalize_bounds, band_bounds
+from project.dtw.kernels import fill_wavefront, trace_path
+import numpy as np
+
+
+def coarsen(s):
+    """
+    Function to halve the resolution of a signal by averaging pairs of neighbouring samples.
+    :param s: signal, multivariate signals with samples in rows.
+    :return: signal with half of samples, the last sample of a signal of odd length is kept.
+    """
+    s = np.asarray(s, dtype=float)
+    coarse = s[:len(s) - len(s) % 2].reshape((-1, 2) + s.shape[1:]).mean(axis=1)
+    if len(s) % 2:
+        coarse = np.concatenate((coarse, s[-1:]))
+    return coarse
+
+
+def _project_path(path, n, m, radius):
+    """
+    Function to project a warping path onto a matrix of twice the resolution and widen it by a radius.
+    :param path: warping path at a coarse resolution as an array of (i, j) pairs.
+    :param n: length of the first signal at a fine resolution.
+    :param m: length of the second signal at a fine resolution.
+    :param radius: number of cells a projected path is widened by on each side.
+    :return: first allowed column and column after the last allowed one for each row of a matrix.
+    """
+    rows = (n + 1) // 2
+    first, last = np.full(rows, m, dtype=np.int64), np.zeros(rows, dtype=np.int64)
+    np.minimum.at(first, path[:, 0], path[:, 1])
+    np.maximum.at(last, path[:, 0], path[:, 1])
+    # each coarse cell covers 2 x 2 cells, and columns of a monotonic path never decrease with rows
+    fine_rows = np.arange(n) // 2
+    lower, upper = 2 * first[fine_rows], 2 * last[fine_rows] + 1
+    lower = lower[np.maximum(np.arange(n) - radius, 0)] - radius
+    upper = upper[np.minimum(np.arange(n) + radius, n - 1)] + radius
+    return _finalize_bounds(lower + 1, upper + 2, m)
+
+
+def fastdtw_bounds(x, y, radius):
+    """
+    Function to get a band of the accumulated cost matrix found by FastDTW. Signals are coarsened recursively, a warping
+    path found at a coarse resolution is projected onto the next resolution and widened by a radius, and DTW is
+    computed only inside such a band. Memory and time are linear in the length of signals for a fixed radius. The last
+    cell of a matrix inside a band is never lower than the exact one.
+    :param x: first signal.
+    :param y: second signal.
+    :param radius: number of cells a projected path is widened by on each side.
+    :return: first allowed column and column after the last allowed one for each row of a matrix.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n, m = len(x), len(y)
+    if min(n, m) <= radius + 2:
+        return band_bounds(n, m)
+    coarse_x, coarse_y = coarsen(x), coarsen(y)
+    lo, hi = fastdtw_bounds(coarse_x, coarse_y, radius)
+    matrix, steps = BandedMatrix.initialized(lo, hi), BandedMatrix(lo, hi, fill_value=-1, dtype=np.int8)
+    fill_wavefront(coarse_x, coarse_y, matrix, steps)
+    path = np.array(trace_path(matrix, steps)[0], dtype=np.int64).reshape(-1, 2)
+    return _project_path(path, n, m, radius)
@@ -0,0 +1,165 @@
+"""
+@author: Radoslaw Plawecki
+Recovery of a warping path without a full matrix, by divide and conquer over anti-diagonals of a matrix.
+Sources:
+[1] Hirschberg, D. S. (1975). A linear space algorithm for computing maximal common subsequences. Communications of
+the ACM, 18(6), 341-343.
+"""
+
+from project.dtw.kernels import choose_step, cost_dtype, diagonal_ranges, local_distance, signal_dimensions, walk_path
+import numpy as np
+
+# maximum number of cells of anti-diagonals searched at once
+BLOCK_CELLS = 2 ** 20
+
+
+class _Diagonals:
+    def __init__(self, diagonals, first):
+        """
+        Method to initialize params of a class.
+        :param diagonals: list of consecutive anti-diagonals, each stored as its first row and a vector of cells from
+                          this row.
+        :param first: number of the first anti-diagonal on the list.
+        """
+        self.diagonals, self.first = diagonals, first
+
+    def __getitem__(self, index):
+        """
+        Method to get a value of a cell using indices of a whole matrix.
+        :param index: row and column of a cell.
+        :return: value of a cell.
+        """
+        i, j = index
+        first_row, values = self.diagonals[i + j - self.first]
+        return values[i - first_row]
+
+
+class _Wavefront:
+    def __init__(self, x, y, lo, hi):
+        """
+        Method to initialize params of a class.
+        :param x: first signal.
+        :param y: second signal.
+        :param lo: first allowed column for each row of a matrix.
+        :param hi: column after the last allowed one for each row of a matrix.
+        """
+        self.dtype = cost_dtype(x, y)
+        x, y = signal_dimensions(x, y)
+        self.x, self.y, self.y_reversed = x, y, y[:, ::-1]
+        self.n, self.m = x.shape[1], y.shape[1]
+        starts, stops = diagonal_ranges(lo, hi, self.n, self.m)
+        self.starts, self.stops = starts.tolist(), stops.tolist()
+        # an anti-diagonal stores cells inside a band and the cell before them, read by the next anti-diagonal
+        self.width = int(np.max(stops - starts, initial=0)) + 1
+
+    def initial_diagonals(self):
+        """
+        Method to get anti-diagonals 0 and 1 of a matrix, i.e. the initial cell and no cells to compute.
+        :return: list with both anti-diagonals.
+        """
+        return [(0, np.zeros(1, dtype=self.dtype)), (0, np.empty(0, dtype=self.dtype))]
+
+    def __rows(self, diagonal, start, stop):
+        """
+        Method to get cells of an anti-diagonal in a range of rows, cells which are not stored lie outside a band.
+        :param diagonal: first row of an anti-diagonal and a vector of its cells.
+        :param start: first row.
+        :param stop: row after the last one.
+        :return: values of cells, infinite outside a band.
+        """
+        first_row, values = diagonal
+        if first_row <= start and stop <= first_row + len(values):
+            return values[start - first_row:stop - first_row]
+        cells = np.full(stop - start, np.inf, dtype=self.dtype)
+        overlap_start, overlap_stop = max(start, first_row), min(stop, first_row + len(values))
+        if overlap_start < overlap_stop:
+            cells[overlap_start - start:overlap_stop - start] = values[overlap_start - first_row:
+                                                                       overlap_stop - first_row]
+        return cells
+
+    def next_diagonal(self, two_before, before, d):
+        """
+        Method to calculate an anti-diagonal of a matrix from the two previous ones. Only cells inside a band are
+        allocated, so the memory and the time of an anti-diagonal are proportional to the width of a band.
+        :param two_before: anti-diagonal d - 2.
+        :param before: anti-diagonal d - 1.
+        :param d: number of an anti-diagonal.
+        :return: anti-diagonal d and steps chosen for its cells, both as their first row and a vector of cells.
+        """
+        i_start, i_stop = self.starts[d - 2], self.stops[d - 2]
+        if i_start >= i_stop:
+            return (i_start, np.empty(0, dtype=self.dtype)), (i_start, np.empty(0, dtype=np.int8))
+        current, steps = np.empty(i_stop - i_start + 1, dtype=self.dtype), np.empty(i_stop - i_start + 1, dtype=np.int8)
+        current[0], steps[0] = np.inf, -1
+        component, steps[1:] = choose_step(self.__rows(two_before, i_start - 1, i_stop - 1),
+                                           self.__rows(before, i_start - 1, i_stop - 1),
+                                           self.__rows(before, i_start, i_stop))
+        y_start = self.m - d
+        distance = local_distance(self.x[:, i_start - 1:i_stop - 1],
+                                  self.y_reversed[:, y_start + i_start:y_start + i_stop])
+        current[1:] = distance + component
+        return (i_start - 1, current), (i_start - 1, steps)
+
+
+def _recover(wavefront, first, last, checkpoint, cell, block, parts):
+    """
+    Function to find a part of a warping path going back from a cell until it leaves anti-diagonals first..last.
+    :param wavefront: Wavefront object calculating anti-diagonals.
+    :param first: first anti-diagonal of a part.
+    :param last: last anti-diagonal of a part.
+    :param checkpoint: anti-diagonals first - 2 and first - 1.
+    :param cell: cell to start from, lying on anti-diagonal last or last - 1.
+    :param block: maximum number of anti-diagonals searched at once.
+    :param parts: list to append found parts of a path to.
+    :return: cell where a path left a part.
+    """
+    if last - first + 1 <= block:
+        diagonals, steps = list(checkpoint), [None, None]
+        for d in range(first, last + 1):
+            diagonal, diagonal_steps = wavefront.next_diagonal(diagonals[-2], diagonals[-1], d)
+            diagonals.append(diagonal)
+            steps.append(diagonal_steps)
+        part = walk_path(_Diagonals(diagonals, first - 2), _Diagonals(steps, first - 2), *cell, first_diagonal=first)
+        parts.append(part[:-1])
+        return part[-1]
+    middle = (first + last) // 2
+    two_before, before = checkpoint
+    for d in range(first, middle + 1):
+        two_before, before = before, wavefront.next_diagonal(two_before, before, d)[0]
+    i, j = _recover(wavefront, middle + 1, last, (two_before, before), cell, block, parts)
+    del two_before, before
+    if i == 0 or j == 0:
+        return i, j
+    return _recover(wavefront, first, middle, checkpoint, (i, j), block, parts)
+
+
+def trace_path_linear(x, y, lo, hi, block_cells=BLOCK_CELLS):
+    """
+    Function to find a warping path without a full matrix. Anti-diagonals of a matrix are split in halves, the two
+    anti-diagonals before the second half are computed with rolling anti-diagonals, then the second half is searched
+    first and the first half ends where the path left the second one. Small parts are searched with all their
+    anti-diagonals in memory. Steps are chosen exactly as in a full matrix, so it is the same path. Only cells of
+    anti-diagonals inside a band are stored, and two anti-diagonals per level of division are kept in memory, i.e.
+    O(w log(n + m)) for anti-diagonals of at most w cells inside a band (w <= min(n, m) + 1), while the time is
+    O(w (n + m) log(n + m)).
+    :param x: first signal.
+    :param y: second signal.
+    :param lo: first allowed column for each row of a matrix.
+    :param hi: column after the last allowed one for each row of a matrix.
+    :param block_cells: maximum number of cells of anti-diagonals searched at once.
+    :return: warping path from the last pair of indices to the first one, values of a matrix along a path, number of
+             matches, insertions and deletions.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n, m = len(x), len(y)
+    wavefront = _Wavefront(x, y, lo, hi)
+    block = max(block_cells // wavefront.width - 2, 1)
+    parts = []
+    _recover(wavefront, 2, n + m, wavefront.initial_diagonals(), (n, m), block, parts)
+    path, path_costs, matches, insertions, deletions = [], [], 0, 0, 0
+    for part_path, part_costs, part_matches, part_insertions, part_deletions in parts:
+        path += part_path
+        path_costs += part_costs
+        matches, insertions, deletions = (matches + part_matches, insertions + part_insertions,
+                                          deletions + part_deletions)
+    return path, path_costs, matches, insertions, deletions
@@ -0,0 +1,388 @@
+"""
+@author: Radoslaw Plawecki
+Numerical kernels filling the accumulated cost matrix of DTW.
+"""
+
+import numpy as np
+
+ENGINES = ("loop", "wavefront", "tiled")
+# number of rows and columns of a tile of a matrix computed in memory by the tiled engine
+TILE = 1024
+# steps of a warping path stored in a backpointer matrix, in the order of preference for equal predecessors
+MATCH, INSERTION, DELETION = 0, 1, 2
+
+
+def cost_dtype(x, y):
+    """
+    Function to get the type of cells of a matrix for signals. Cells are float32 only for float32 signals.
+    :param x: first signal.
+    :param y: second signal.
+    :return: type of cells.
+    """
+    dtype = np.result_type(x, y)
+    return dtype if dtype == np.float32 else np.dtype(float)
+
+
+def signal_dimensions(x, y):
+    """
+    Function to prepare signals for kernels. Samples of signals are placed along the last axis and dimensions along
+    the first one, a univariate signal has one dimension, a multivariate one has samples in rows and dimensions in
+    columns.
+    :param x: first signal.
+    :param y: second signal.
+    :return: both signals as arrays of dimensions and samples.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if x.ndim > 1:
+        return np.ascontiguousarray(x.T), np.ascontiguousarray(y.T)
+    return x[np.newaxis], y[np.newaxis]
+
+
+def local_distance(x, y):
+    """
+    Function to calculate distances of samples, i.e. sums of absolute differences in all dimensions (L1). Dimensions
+    are added one by one, so a distance is exactly the same in every engine, and for univariate signals it is the
+    absolute difference of samples.
+    :param x: samples of the first signal with dimensions along the first axis.
+    :param y: samples of the second signal with dimensions along the first axis.
+    :return: distances of samples.
+    """
+    difference = np.abs(x - y)
+    distance = difference[0]
+    for k in range(1, len(difference)):
+        distance = distance + difference[k]
+    return distance
+
+
+def choose_step(match, insertion, deletion):
+    """
+    Function to choose the predecessors of cells, preferring a match, then an insertion, then a deletion.
+    :param match: values of cells (i - 1, j - 1).
+    :param insertion: values of cells (i - 1, j).
+    :param deletion: values of cells (i, j - 1).
+    :return: minimum values of predecessors and steps to them as an int8 array.
+    """
+    component = np.minimum(np.minimum(match, insertion), deletion)
+    step = np.where(match == component, MATCH, np.where(insertion == component, INSERTION, DELETION))
+    return component, step.astype(np.int8)
+
+
+def fill_loop(x, y, matrix, steps=None):
+    """
+    Function to fill a matrix cell by cell. It is the reference implementation of the recurrence.
+    :param x: first signal.
+    :param y: second signal.
+    :param matrix: initialized matrix as BandedMatrix object.
+    :param steps: BandedMatrix object with the same band to store chosen steps in, optional.
+    :return: filled matrix.
+    """
+    cell = matrix.values.dtype.type
+    x, y = signal_dimensions(x, y)
+    for i in range(1, x.shape[1] + 1):
+        lo = matrix.lo[i]
+        for j in range(max(lo, 1), matrix.hi[i]):
+            distance = local_distance(x[:, i - 1], y[:, j - 1])
+            predecessors = [matrix[i - 1, j - 1], matrix[i - 1, j], matrix[i, j - 1]]
+            component = cell(np.min(predecessors))
+            matrix.values[i, j - lo] = distance + component
+            if steps is not None:
+                steps.values[i, j - lo] = np.argmin(predecessors)
+    return matrix
+
+
+def diagonal_ranges(lo, hi, n, m):
+    """
+    Function to get rows of cells inside a band for each anti-diagonal d = i + j, d = 2, ..., n + m. The rows form
+    a single range, because bounds of a band are monotonic.
+    :param lo: first allowed column for each row.
+    :param hi: column after the last allowed one for each row.
+    :param n: length of the first signal.
+    :param m: length of the second signal.
+    :return: first row and row after the last one for each anti-diagonal.
+    """
+    rows = np.arange(n + 1)
+    diagonals = np.arange(2, n + m + 1)
+    # cell (i, d - i) is inside a band if lo[i] <= d - i < hi[i], the initial row and column are never computed
+    starts = np.maximum(np.searchsorted(rows + hi, diagonals, side="right"), 1)
+    stops = np.minimum(np.minimum(np.searchsorted(rows + lo, diagonals, side="right"), n + 1), diagonals)
+    return starts, stops
+
+
+def fill_block_wavefront(x, y, block, lo, hi, steps=None, multivariate=False):
+    """
+    Function to fill a full block of a matrix along anti-diagonals using strided views. The initial row of a block may
+    hold any values, e.g. a row of a larger matrix, and only cells inside a band are computed. Leading dimensions of
+    signals and a block are a batch, i.e. many pairs of signals of the same lengths are computed at once.
+    :param x: first signal, or an array of signals with samples along the last axis.
+    :param y: second signal, or an array of signals with samples along the last axis.
+    :param block: array with the initial row and column set and other cells infinite, matrices along the last two axes.
+    :param lo: first allowed column for each row of a block.
+    :param hi: column after the last allowed one for each row of a block.
+    :param steps: int8 array of the shape of a block to store chosen steps in, optional.
+    :param multivariate: whether signals are multivariate, with samples along the second to last axis and dimensions
+                         along the last one.
+    """
+    if multivariate:
+        x, y = np.moveaxis(x, -1, 0), np.moveaxis(y, -1, 0)
+    else:
+        x, y = x[np.newaxis], y[np.newaxis]
+    n, m = x.shape[-1], y.shape[-1]
+    y_reversed = y[..., ::-1]
+    # in the flattened block the cells of an anti-diagonal are placed every m elements
+    flat = block.reshape(block.shape[:-2] + (-1,))
+    flat_steps = None if steps is None else steps.reshape(steps.shape[:-2] + (-1,))
+    starts, stops = diagonal_ranges(lo, hi, n, m)
+    for d, i_start, i_stop in zip(range(2, n + m + 1), starts.tolist(), stops.tolist()):
+        if i_start >= i_stop:
+            continue
+        start = i_start * (m + 1) + d - i_start
+        stop = start + (i_stop - i_start) * m
+        match, insertion, deletion = (flat[..., start - m - 2:stop - m - 2:m], flat[..., start - m - 1:stop - m - 1:m],
+                                      flat[..., start - 1:stop - 1:m])
+        if flat_steps is None:
+            component = np.minimum(np.minimum(match, insertion), deletion)
+        else:
+            component, flat_steps[..., start:stop:m] = choose_step(match, insertion, deletion)
+        distance = local_distance(x[..., i_start - 1:i_stop - 1], y_reversed[..., m - d + i_start:m - d + i_stop])
+        flat[..., start:stop:m] = distance + component
+
+
+def _fill_banded_wavefront(x, y, matrix, steps):
+    """
+    Function to fill a band of a matrix along anti-diagonals.
+    :param x: first signal.
+    :param y: second signal.
+    :param matrix: initialized matrix as BandedMatrix object.
+    :param steps: BandedMatrix object with the same band to store chosen steps in, optional.
+    """
+    x, y = signal_dimensions(x, y)
+    n, m = x.shape[1], y.shape[1]
+    rows = np.arange(n + 1)
+    starts, stops = diagonal_ranges(matrix.lo, matrix.hi, n, m)
+    for d, i_start, i_stop in zip(range(2, n + m + 1), starts, stops):
+        if i_start >= i_stop:
+            continue
+        i = rows[i_start:i_stop]
+        j = d - i
+        match, insertion, deletion = matrix.take(i - 1, j - 1), matrix.take(i - 1, j), matrix.take(i, j - 1)
+        if steps is None:
+            component = np.minimum(np.minimum(match, insertion), deletion)
+        else:
+            component, step = choose_step(match, insertion, deletion)
+            steps.put(i, j, step)
+        matrix.put(i, j, local_distance(x[:, i - 1], y[:, j - 1]) + component)
+
+
+def fill_wavefront(x, y, matrix, steps=None):
+    """
+    Function to fill a matrix along anti-diagonals. All cells with the same i + j depend only on the two previous
+    anti-diagonals, so every anti-diagonal is computed with a single vectorized NumPy expression. Each cell is computed
+    with the same operations as in the loop, so the results are exactly equal.
+    :param x: first signal.
+    :param y: second signal.
+    :param matrix: initialized matrix as BandedMatrix object.
+    :param steps: BandedMatrix object with the same band to store chosen steps in, optional.
+    :return: filled matrix.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if matrix.dense:
+        fill_block_wavefront(x, y, matrix.values, matrix.lo, matrix.hi, None if steps is None else steps.values,
+                             multivariate=x.ndim > 1)
+    else:
+        _fill_banded_wavefront(x, y, matrix, steps)
+    return matrix
+
+
+def _store_tile(matrix, block, r0, c0):
+    """
+    Function to write cells of a computed tile inside a band to a matrix.
+    :param matrix: BandedMatrix object.
+    :param block: computed block, its first row and column are the cells before a tile.
+    :param r0: first row of a tile in a matrix.
+    :param c0: first column of a tile in a matrix.
+    """
+    r1, c1 = r0 + block.shape[0] - 1, c0 + block.shape[1] - 1
+    if matrix.dense:
+        matrix.values[r0:r1, c0:c1] = block[1:, 1:]
+        return
+    for i in range(r0, r1):
+        start, stop = max(matrix.lo[i], c0), min(matrix.hi[i], c1)
+        if start < stop:
+            matrix.values[i, start - matrix.lo[i]:stop - matrix.lo[i]] = block[i - r0 + 1, start - c0 + 1:stop - c0 + 1]
+
+
+def fill_tiled(x, y, matrix, steps=None, tile=TILE):
+    """
+    Function to fill a matrix tile by tile, so only one tile is kept in memory while a matrix may be stored on disk.
+    Tiles are computed row by row, each one from the last row and column of the tiles before it, along anti-diagonals
+    as in the wavefront engine, so the results are exactly equal. Tiles outside a band are skipped.
+    :param x: first signal.
+    :param y: second signal.
+    :param matrix: initialized matrix as BandedMatrix object, e.g. stored in a memory-mapped file.
+    :param steps: BandedMatrix object with the same band to store chosen steps in, optional.
+    :param tile: number of rows and columns of a tile.
+    :return: filled matrix.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n, m = len(x), len(y)
+    lo, hi = matrix.lo, matrix.hi
+    for r0 in range(1, n + 1, tile):
+        r1 = min(r0 + tile, n + 1)
+        for c0 in range(1, m + 1, tile):
+            c1 = min(c0 + tile, m + 1)
+            if not np.any((lo[r0:r1] < c1) & (hi[r0:r1] > c0)):
+                continue
+            rows, columns = np.arange(r0 - 1, r1), np.arange(c0 - 1, c1)
+            block = np.full([len(rows), len(columns)], np.inf, dtype=matrix.values.dtype)
+            block[0], block[:, 0] = matrix.take(np.full(len(columns), r0 - 1), columns), matrix.take(rows, c0 - 1)
+            block_steps = None if steps is None else np.full(block.shape, -1, dtype=np.int8)
+            # a band of a tile is the band of a matrix shifted to the first column of a block
+            block_lo = np.clip(lo[r0 - 1:r1] - (c0 - 1), 0, len(columns))
+            block_hi = np.clip(hi[r0 - 1:r1] - (c0 - 1), 0, len(columns))
+            fill_block_wavefront(x[r0 - 1:r1 - 1], y[c0 - 1:c1 - 1], block, block_lo, block_hi, block_steps,
+                                 multivariate=x.ndim > 1)
+            _store_tile(matrix, block, r0, c0)
+            if steps is not None:
+                _store_tile(steps, block_steps, r0, c0)
+    return matrix
+
+
+def distance_loop(x, y, lo, hi, limit=np.inf, remaining=None):
+    """
+    Function to calculate the last cell of a matrix row by row, keeping only two rows in memory.
+    :param x: first signal.
+    :param y: second signal.
+    :param lo: first allowed column for each row.
+    :param hi: column after the last allowed one for each row.
+    :param limit: value above which the calculation is abandoned, infinite by default.
+    :param remaining: lower bounds of the cost of a warping path after each row and after each column, zero by default.
+    :return: value of the last cell of a matrix, infinite if the calculation was abandoned.
+    """
+    dtype = cost_dtype(x, y)
+    x, y = signal_dimensions(x, y)
+    n, m = x.shape[1], y.shape[1]
+    rows, columns = (np.zeros(n + 1), np.zeros(m + 1)) if remaining is None else remaining
+    previous = np.full(m + 1, np.inf, dtype=dtype)
+    previous[0] = 0
+    for i in range(1, n + 1):
+        current = np.full(m + 1, np.inf, dtype=dtype)
+        for j in range(max(lo[i], 1), hi[i]):
+            distance = local_distance(x[:, i - 1], y[:, j - 1])
+            component = np.min([previous[j - 1], previous[j], current[j - 1]])
+            current[j] = distance + component
+        # a warping path goes through every row, so the rest of it costs at least as much as rows or columns after it
+        if limit < np.inf and np.min(current + np.maximum(rows[i], columns)) > limit:
+            return np.inf
+        previous = current
+    return previous[m]
+
+
+def distance_wavefront(x, y, lo, hi, limit=np.inf, remaining=None):
+    """
+    Function to calculate the last cell of a matrix along anti-diagonals, keeping only three anti-diagonals in memory.
+    Anti-diagonal d is stored as a vector indexed by rows, so the neighbours of cell i are at i - 1 and i of the
+    previous anti-diagonals. Values are exactly equal to the ones in a full matrix.
+    :param x: first signal.
+    :param y: second signal.
+    :param lo: first allowed column for each row.
+    :param hi: column after the last allowed one for each row.
+    :param limit: value above which the calculation is abandoned, infinite by default.
+    :param remaining: lower bounds of the cost of a warping path after each row and after each column, zero by default.
+    :return: value of the last cell of a matrix, infinite if the calculation was abandoned.
+    """
+    dtype = cost_dtype(x, y)
+    x, y = signal_dimensions(x, y)
+    n, m = x.shape[1], y.shape[1]
+    y_reversed = y[:, ::-1]
+    rows, columns = (np.zeros(n + 1), np.zeros(m + 1)) if remaining is None else remaining
+    columns_reversed = columns[::-1]
+    # lower bound of the last cell for paths going through the previous anti-diagonal
+    bound_before = np.inf
+    starts, stops = diagonal_ranges(lo, hi, n, m)
+    diagonals = [np.full(n + 1, np.inf, dtype=dtype) for _ in range(3)]
+    # anti-diagonal 0 holds the initial cell, anti-diagonal 1 has no cells to compute
+    diagonals[0][0] = 0
+    written = [(0, 1), (0, 0), (0, 0)]
+    for d, i_start, i_stop in zip(range(2, n + m + 1), starts, stops):
+        two_before, before, current = diagonals[(d - 2) % 3], diagonals[(d - 1) % 3], diagonals[d % 3]
+        # only cells written three anti-diagonals ago have to be cleared
+        current[slice(*written[d % 3])] = np.inf
+        written[d % 3] = (i_start, i_stop)
+        if i_start >= i_stop:
+            bound_before = np.inf
+            continue
+        component = np.minimum(np.minimum(two_before[i_start - 1:i_stop - 1], before[i_start - 1:i_stop - 1]),
+                               before[i_start:i_stop])
+        distance = local_distance(x[:, i_start - 1:i_stop - 1], y_reversed[:, m - d + i_start:m - d + i_stop])
+        current[i_start:i_stop] = distance + component
+        if limit < np.inf:
+            # a warping path goes through one of every two consecutive anti-diagonals, and the rest of it costs at
+            # least as much as rows or columns after a cell
+            bound = np.min(current[i_start:i_stop] + np.maximum(rows[i_start:i_stop],
+                                                                columns_reversed[m - d + i_start:m - d + i_stop]))
+            if min(bound, bound_before) > limit:
+                return np.inf
+            bound_before = bound
+    return diagonals[(n + m) % 3][n]
+
+
+def walk_path(matrix, steps, i, j, first_diagonal=2):
+    """
+    Function to find a part of a warping path by following steps chosen while filling a matrix.
+    :param matrix: filled matrix, any object returning a value of a cell for matrix[i, j].
+    :param steps: chosen steps, any object returning a step of a cell for steps[i, j].
+    :param i: row of a cell to start from.
+    :param j: column of a cell to start from.
+    :param first_diagonal: anti-diagonal i + j at which a walk stops after leaving it.
+    :return: pairs of indices of signals, values of a matrix along a path, number of matches, insertions and
+             deletions, and the cell where a walk stopped.
+    """
+    counts = [0, 0, 0]
+    path, path_costs = [], []
+    while i > 0 and j > 0 and i + j >= first_diagonal:
+        path.append((i - 1, j - 1))
+        path_costs.append(matrix[i, j])
+        step = steps[i, j]
+        counts[step] += 1
+        if step != DELETION:
+            i -= 1
+        if step != INSERTION:
+            j -= 1
+    return path, path_costs, counts[MATCH], counts[INSERTION], counts[DELETION], (i, j)
+
+
+def trace_path(matrix, steps):
+    """
+    Function to find a warping path by going back from the last cell of a filled matrix.
+    :param matrix: filled matrix as BandedMatrix object.
+    :param steps: chosen steps as BandedMatrix object.
+    :return: warping path from the last pair of indices to the first one, values of a matrix along a path, number of
+             matches, insertions and deletions.
+    """
+    n, m = matrix.shape
+    return walk_path(matrix, steps, n - 1, m - 1)[:-1]
+
+
+def trace_paths_batch(matrices, steps):
+    """
+    Function to find warping paths of many pairs of signals at once, going back from the last cells of their matrices.
+    All paths are walked together and each stops when it reaches the initial row or column of its matrix.
+    :param matrices: filled matrices along the last two axes.
+    :param steps: chosen steps of matrices.
+    :return: sums of values of matrices along paths, lengths of paths, numbers of matches, insertions and deletions.
+    """
+    batch = np.arange(len(matrices))
+    i, j = np.full(len(matrices), matrices.shape[1] - 1), np.full(len(matrices), matrices.shape[2] - 1)
+    costs = np.zeros(len(matrices))
+    counts = np.zeros([3, len(matrices)], dtype=np.int64)
+    active = (i > 0) & (j > 0)
+    while active.any():
+        k, i_k, j_k = batch[active], i[active], j[active]
+        costs[k] += matrices[k, i_k, j_k]
+        step = steps[k, i_k, j_k]
+        counts[step, k] += 1
+        i[k] -= step != DELETION
+        j[k] -= step != INSERTION
+        active = (i > 0) & (j > 0)
+    matches, insertions, deletions = counts
+    return costs, matches + insertions + deletions, matches, insertions, deletions
@@ -0,0 +1,154 @@
+"""
+@author: Radoslaw Plawecki
+Index of windows of signals answering queries for the k nearest windows under DTW, e.g. to label a window by the
+conditions of the most similar stored ones. Lower bounds of increasing cost and tightness are checked before DTW is
+computed, so most stored windows are never compared with a query by DTW.
+Sources:
+[1] Keogh, E., Ratanamahatana, C. A. (2005). Exact indexing of dynamic time warping. Knowledge and Information
+Systems, 7(3), 358-386.
+[2] Rakthanmanon, T. et al. (2012). Searching and mining trillions of time series subsequences under dynamic time
+warping. Proceedings of the 18th ACM SIGKDD International Conference on Knowledge Discovery and Data Mining, 262-270.
+"""
+
+from project.dtw.band import band_bounds
+from project.dtw.bounds import envelopes, keogh_terms, lb_kim, relative_tolerance, remaining_bounds, transpose_bounds
+from project.dtw.dtw import DTW
+from project.dtw.kernels import distance_wavefront
+from project.dtw.reduced import SEGMENTS, segment_starts
+from collections import Counter
+import heapq
+import numpy as np
+
+# record with a stored window and its alignment cost with a query
+NEIGHBOUR_DTYPE = np.dtype([("position", np.int64), ("cost", float)])
+
+
+class WindowIndex:
+    def __init__(self, window_size, var=None, constraint=None, radius=None, slope=None, segments=SEGMENTS):
+        """
+        Method to initialize params of a class. All windows have the same size, so they share one band, and envelopes
+        of stored windows and their summaries are computed once, when windows are added.
+        :param window_size: number of samples of a window.
+        :param var: variant of DTW, classic (None) or derivative (DDTW), applied to each window.
+        :param constraint: global constraint, none (None), Sakoe-Chiba band (sakoe-chiba) or Itakura parallelogram
+                           (itakura).
+        :param radius: radius of the Sakoe-Chiba band in samples.
+        :param slope: maximum slope of the Itakura parallelogram.
+        :param segments: number of segments of summaries of envelopes, i.e. means of segments of samples (PAA).
+        """
+        if var not in (None, "DDTW"):
+            raise ValueError("Allowed variants of DTW: classic (var=None), derivative (var=DDTW).")
+        self.window_size, self.var = window_size, var
+        self.lo, self.hi = band_bounds(window_size, window_size, constraint, radius, slope)
+        self.segment_starts = segment_starts(window_size, segments)
+        self.labels = []
+        # blocks of windows, their lower and upper envelopes and sums of envelopes in segments, with dimensions along
+        # the second axis and samples along the last one, joined into one block before a query
+        self.__blocks = []
+
+    def __len__(self):
+        """
+        Method to get the number of stored windows.
+        :return: number of windows.
+        """
+        return len(self.labels)
+
+    def __prepare(self, windows):
+        """
+        Method to apply a variant of DTW to windows and place their dimensions along the second axis.
+        :param windows: array of windows, samples of a window in rows and dimensions of multivariate windows in columns.
+        :return: windows as an array of windows, dimensions and samples.
+        :raise ValueError: if windows have a different number of samples or dimensions than stored windows.
+        """
+        windows = np.asarray(windows, dtype=float)
+        if windows.ndim not in (2, 3) or windows.shape[1] != self.window_size:
+            raise ValueError(f"Windows must have {self.window_size} samples! Got windows of shape {windows.shape} "
+                             f"instead.")
+        if self.var == "DDTW":
+            windows = np.stack([DTW.derivative_signal(window) for window in windows])
+        windows = windows[:, np.newaxis] if windows.ndim == 2 else np.moveaxis(windows, -1, 1)
+        if self.__blocks and windows.shape[1] != self.__blocks[0][0].shape[1]:
+            raise ValueError(f"Windows must have {self.__blocks[0][0].shape[1]} dimensions! Got {windows.shape[1]} "
+                             f"instead.")
+        return windows
+
+    def __sums(self, s):
+        """
+        Method to sum samples in segments.
+        :param s: array with samples along the last axis.
+        :return: sums of segments.
+        """
+        return np.add.reduceat(s, self.segment_starts, axis=-1)
+
+    def add(self, windows, labels=None):
+        """
+        Method to store windows, e.g. windows of signals analyzed by sliding_window_dtw.
+        :param windows: array of windows, samples of a window in rows and dimensions of multivariate windows in columns.
+        :param labels: labels of windows, e.g. conditions of a recording, positions of windows by default.
+        """
+        windows = self.__prepare(windows)
+        labels = list(range(len(self), len(self) + len(windows)) if labels is None else labels)
+        if len(labels) != len(windows):
+            raise ValueError(f"Number of labels must be equal to the number of windows! Got {len(labels)} labels for "
+                             f"{len(windows)} windows instead.")
+        lower, upper = envelopes(windows, self.lo, self.hi)
+        self.__blocks.append((windows, lower, upper, self.__sums(lower), self.__sums(upper)))
+        self.labels += labels
+
+    def query(self, query, k=1):
+        """
+        Method to find stored windows nearest to a query. Windows are visited in the order of the cheapest bounds,
+        LB_Kim and LB_PAA, i.e. LB_Keogh of summaries of envelopes, computed for all windows at once. A window is
+        skipped as soon as a bound is greater than the k-th best cost: LB_Keogh of a query against the envelope of a
+        window, then of a window against the envelope of a query, and DTW is abandoned early. The search stops at the
+        first window whose cheapest bound is greater, so the result is the same as from DTW of all windows.
+        :param query: window with the same number of samples and dimensions as stored windows.
+        :param k: number of nearest windows.
+        :return: structured array with positions of the nearest windows and their alignment costs using the distance
+                 method, from the nearest one, windows with equal costs in the order of positions.
+        :raise ValueError: if an index is empty or the number of windows is not positive.
+        """
+        if not len(self):
+            raise ValueError("Index has no windows!")
+        if k < 1:
+            raise ValueError(f"Number of windows must have a positive value! Got {k} instead.")
+        query = self.__prepare([query])[0]
+        if len(self.__blocks) > 1:
+            self.__blocks = [tuple(np.concatenate(arrays) for arrays in zip(*self.__blocks))]
+        windows, lower, upper, lower_sums, upper_sums = self.__blocks[0]
+        n = self.window_size
+        # bounds are summed in a different order than cells of a matrix
+        tolerance = relative_tolerance(windows.dtype, 2 * n * len(query))
+        query_sums = self.__sums(query)
+        paa = np.maximum(query_sums - upper_sums, 0) + np.maximum(lower_sums - query_sums, 0)
+        bounds = np.maximum(lb_kim(query, windows).sum(axis=1), paa.sum(axis=(1, 2))) * (1 - tolerance)
+        query_lower, query_upper = envelopes(query, *transpose_bounds(self.lo, self.hi, n))
+        # the k best windows as a heap with the worst one first
+        best = []
+        for pos in np.argsort(bounds, kind="stable").tolist():
+            worst = -best[0][0] if len(best) == k else np.inf
+            if bounds[pos] > worst:
+                break
+            x_terms = keogh_terms(query, lower[pos], upper[pos]).sum(axis=0)
+            if x_terms.sum() * (1 - tolerance) > worst:
+                continue
+            y_terms = keogh_terms(windows[pos], query_lower, query_upper).sum(axis=0)
+            if y_terms.sum() * (1 - tolerance) > worst:
+                continue
+            distance = distance_wavefront(query.T, windows[pos].T, self.lo, self.hi, worst * (1 + tolerance),
+                                          remaining_bounds(x_terms, y_terms))
+            if len(best) < k:
+                heapq.heappush(best, (-distance, -pos))
+            elif (distance, pos) < (worst, -best[0][1]):
+                heapq.heapreplace(best, (-distance, -pos))
+        neighbours = sorted((-distance, -pos) for distance, pos in best)
+        return np.array([(pos, distance / (2 * n)) for distance, pos in neighbours], dtype=NEIGHBOUR_DTYPE)
+
+    def classify(self, query, k=1):
+        """
+        Method to label a query by the most common label of the nearest stored windows.
+        :param query: window with the same number of samples and dimensions as stored windows.
+        :param k: number of nearest windows.
+        :return: most common label, of the nearest window among equally common ones.
+        """
+        return Counter(self.labels[pos] for pos in self.query(query, k)["position"]).most_common(1)[0][0]
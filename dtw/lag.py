@@ -0,0 +1,36 @@
+"""
+@author: Radoslaw Plawecki
+Estimation of a global lag between signals by cross-correlation computed with the fast Fourier transform, used to
+centre a band of the accumulated cost matrix on an offset diagonal.
+"""
+
+import numpy as np
+
+
+def estimate_lag(x, y, max_lag=None):
+    """
+    Function to estimate a lag of the second signal behind the first one as the maximum of their cross-correlation.
+    Differences of neighbouring samples are correlated instead of samples, so slow trends do not bias the maximum
+    towards no lag, and they are padded with zeros, so the correlation is not circular. The correlation of
+    multivariate signals (samples in rows, dimensions in columns) is summed over dimensions.
+    :param x: first signal.
+    :param y: second signal.
+    :param max_lag: maximum absolute lag in samples, None for any lag.
+    :return: lag in samples, positive if samples y[i + lag] match samples x[i], 0 for signals shorter than 2 samples.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) < 2 or len(y) < 2:
+        return 0
+    x, y = np.diff(x, axis=0), np.diff(y, axis=0)
+    x, y = x - x.mean(axis=0), y - y.mean(axis=0)
+    n, m = len(x), len(y)
+    size = 1 << (n + m - 2).bit_length()
+    # correlation[lag] = sum of x[i] * y[i + lag], negative lags are placed at the end
+    correlation = np.fft.irfft(np.conj(np.fft.rfft(x, size, axis=0)) * np.fft.rfft(y, size, axis=0), size, axis=0)
+    correlation = correlation.reshape(size, -1).sum(axis=1)
+    lags = np.concatenate((np.arange(-(n - 1), 0), np.arange(m)))
+    values = np.concatenate((correlation[size - n + 1:], correlation[:m]))
+    if max_lag is not None:
+        inside = np.abs(lags) <= max_lag
+        lags, values = lags[inside], values[inside]
+    return int(lags[np.argmax(values)])
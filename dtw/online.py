@@ -0,0 +1,165 @@
+"""
+@author: Radoslaw Plawecki
+Online DTW of signals arriving sample by sample, e.g. beat-to-beat metrics during a live session, keeping only the
+cells of the accumulated cost matrix which new samples may still reach.
+"""
+
+import numpy as np
+
+
+def _distance(a, b):
+    """
+    Function to calculate the distance of samples given as tuples of floats, adding dimensions one by one, so it is
+    exactly the same as in other engines.
+    :param a: sample of the first signal.
+    :param b: sample of the second signal.
+    :return: sum of absolute differences in all dimensions.
+    """
+    distance = abs(a[0] - b[0])
+    for k in range(1, len(a)):
+        distance += abs(a[k] - b[k])
+    return distance
+
+
+class OnlineDTW:
+    def __init__(self, radius):
+        """
+        Method to initialize params of a class. Cells are computed inside the Sakoe-Chiba band around the diagonal
+        i = j, so when signals arrive at the same rate every new sample updates at most 2 * radius + 1 cells, and only
+        cells and samples near the last ones are kept in memory. A signal ahead of the other one by more than a radius
+        has no warping path until the other one catches up, and its samples wait in memory.
+        :param radius: radius of the Sakoe-Chiba band in samples.
+        """
+        if radius is None or radius < 0:
+            raise ValueError("Online DTW requires a non-negative radius!")
+        self.radius = radius
+        # lengths of signals received so far
+        self.n, self.m = 0, 0
+        self.__dimensions = None
+        # samples and rows of cells by their index, rows hold columns i - radius, ..., i + radius
+        self.__x, self.__y, self.__rows = {}, {}, {}
+        # first kept row, sample of the first signal and of the second one, all earlier ones are already removed
+        self.__first = [1, 1, 1]
+
+    def __sample(self, s):
+        """
+        Method to convert a sample to a tuple of floats and check its number of dimensions.
+        :param s: sample, a number or a vector of a multivariate signal.
+        :return: sample as a tuple of floats.
+        :raise ValueError: if a sample has a different number of dimensions than the first one.
+        """
+        s = tuple(np.atleast_1d(np.asarray(s, dtype=float)).tolist())
+        if self.__dimensions is None:
+            self.__dimensions = len(s)
+        elif len(s) != self.__dimensions:
+            raise ValueError(f"Samples must have the same number of dimensions! Got {len(s)} instead of "
+                             f"{self.__dimensions}.")
+        return s
+
+    def __cell(self, i, j):
+        """
+        Method to get the value of a cell of a matrix.
+        :param i: row of a cell.
+        :param j: column of a cell.
+        :return: value of a cell, infinite outside a band or for cells not computed yet.
+        """
+        if i == 0 or j == 0:
+            return 0.0 if i == j else np.inf
+        if abs(i - j) > self.radius or i not in self.__rows:
+            return np.inf
+        return self.__rows[i][j - i + self.radius]
+
+    def __set_cell(self, i, j, value):
+        """
+        Method to set the value of a cell of a matrix.
+        :param i: row of a cell.
+        :param j: column of a cell.
+        :param value: value of a cell.
+        """
+        if i not in self.__rows:
+            self.__rows[i] = [np.inf] * (2 * self.radius + 1)
+        self.__rows[i][j - i + self.radius] = value
+
+    def __compute(self, i, j):
+        """
+        Method to compute a cell of a matrix from its predecessors, as in the loop engine.
+        :param i: row of a cell.
+        :param j: column of a cell.
+        """
+        component = min(self.__cell(i - 1, j - 1), self.__cell(i - 1, j), self.__cell(i, j - 1))
+        self.__set_cell(i, j, _distance(self.__x[i], self.__y[j]) + component)
+
+    def __forget(self):
+        """
+        Method to remove rows and samples which are not predecessors of any cell computed in the future. New rows
+        start at row n + 1 and new columns at row m + 1 - radius, so earlier rows and samples are not needed.
+        """
+        stops = (min(self.n, self.m - self.radius), min(self.n + 1, self.m + 1 - self.radius),
+                 min(self.m + 1, self.n + 1 - self.radius))
+        for k, (items, stop) in enumerate(zip((self.__rows, self.__x, self.__y), stops)):
+            for index in range(self.__first[k], stop):
+                items.pop(index, None)
+            self.__first[k] = max(self.__first[k], stop)
+
+    def append_x(self, sample):
+        """
+        Method to add a sample of the first signal, i.e. a row of a matrix with cells of samples of the second signal
+        received so far.
+        :param sample: new sample, a number or a vector of a multivariate signal.
+        """
+        self.n += 1
+        i = self.n
+        self.__x[i] = self.__sample(sample)
+        for j in range(max(1, i - self.radius), min(self.m, i + self.radius) + 1):
+            self.__compute(i, j)
+        self.__forget()
+
+    def append_y(self, sample):
+        """
+        Method to add a sample of the second signal, i.e. a column of a matrix with cells of samples of the first
+        signal received so far.
+        :param sample: new sample, a number or a vector of a multivariate signal.
+        """
+        self.m += 1
+        j = self.m
+        self.__y[j] = self.__sample(sample)
+        for i in range(max(1, j - self.radius), min(self.n, j + self.radius) + 1):
+            self.__compute(i, j)
+        self.__forget()
+
+    def update(self, x=(), y=()):
+        """
+        Method to add new samples of signals, e.g. metrics of a new beat, and get the alignment cost of signals
+        received so far. Samples of both signals are added alternately, the order does not change values of cells.
+        :param x: new samples of the first signal.
+        :param y: new samples of the second signal.
+        :return: alignment cost calculated using the distance method.
+        """
+        x, y = list(x), list(y)
+        for k in range(max(len(x), len(y))):
+            if k < len(x):
+                self.append_x(x[k])
+            if k < len(y):
+                self.append_y(y[k])
+        return self.alignment_cost
+
+    @property
+    def distance(self):
+        """
+        Method to get the last cell of a matrix, i.e. the DTW distance of signals received so far. It equals the
+        distance of DTW with the Sakoe-Chiba band of the same radius for signals of equal lengths.
+        :return: distance, infinite if there is no warping path inside a band.
+        """
+        if self.n == 0 or self.m == 0:
+            return np.inf
+        return self.__cell(self.n, self.m)
+
+    @property
+    def alignment_cost(self):
+        """
+        Method to get the alignment cost of signals received so far using the distance method.
+        :return: alignment cost, infinite if there is no warping path inside a band.
+        """
+        if self.n == 0 or self.m == 0:
+            return np.inf
+        return self.distance / (self.n + self.m)
@@ -0,0 +1,195 @@
+"""
+@author: Radoslaw Plawecki
+All-pairs alignment costs of many signals, e.g. recordings of a cohort to be clustered. Only the upper triangle of a
+symmetric matrix is computed, by a pool of processes, and written to a memory-mapped condensed matrix as pairs are
+finished, so an interrupted calculation is resumed from the pairs not computed yet.
+"""
+
+from project.dtw.cache import ResultCache
+from project.dtw.dtw import ALIGNMENT_METHODS, DTW
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import os
+
+# number of pairs computed by one task of a pool, results are written after each task
+CHUNK_SIZE = 64
+
+# signals and params of DTW objects shared by all tasks of a process of a pool
+_signals, _params = None, None
+
+
+def condensed_index(count, i, j):
+    """
+    Function to get the position of a pair in a condensed matrix, i.e. the upper triangle stored row by row, the same
+    layout as in scipy.spatial.distance.
+    :param count: number of signals.
+    :param i: first signal of a pair.
+    :param j: second signal of a pair, different from the first one.
+    :return: position of a pair.
+    """
+    i, j = min(i, j), max(i, j)
+    return count * i - i * (i + 1) // 2 + j - i - 1
+
+
+def _init_worker(signals, params):
+    """
+    Function to store signals and params in a process of a pool once, instead of sending them with every task.
+    :param signals: list of signals.
+    :param params: params of DTW objects.
+    """
+    global _signals, _params
+    _signals, _params = signals, params
+
+
+def _pair_costs(pairs, method, max_cost):
+    """
+    Function to calculate alignment costs of pairs of signals stored in a process.
+    :param pairs: list of (i, j) pairs of positions of signals.
+    :param method: method to calculate alignment cost.
+    :param max_cost: maximum alignment cost using the distance method, None for no maximum.
+    :return: list with alignment costs in the order of pairs.
+    """
+    costs = []
+    for i, j in pairs:
+        dtw = DTW(_signals[i], _signals[j], **_params)
+        if max_cost is None:
+            costs.append(dtw.calc_alignment_cost(method=method))
+        else:
+            alignment_cost = dtw.calc_bounded_alignment_cost(max_cost)
+            costs.append(alignment_cost if alignment_cost <= max_cost else np.inf)
+    return costs
+
+
+def _pair_bounds(pairs, prefilter):
+    """
+    Function to calculate lower bounds of alignment costs using the distance method of pairs of signals stored in a
+    process, from reduced signals.
+    :param pairs: list of (i, j) pairs of positions of signals.
+    :param prefilter: Prefilter object with params of reduced signals.
+    :return: list with lower bounds in the order of pairs.
+    """
+    return [DTW(_signals[i], _signals[j], **_params).calc_lower_bound(prefilter) for i, j in pairs]
+
+
+def _open_memmap(filename, dtype, count, fill_value, resume):
+    """
+    Function to open a memory-mapped array stored in a file, or to create it.
+    :param filename: name of a file.
+    :param dtype: type of elements.
+    :param count: number of elements.
+    :param fill_value: initial value of elements of a new array.
+    :param resume: whether to open an existing file.
+    :return: memory-mapped array.
+    """
+    if resume:
+        return np.memmap(filename, dtype=dtype, mode="r+", shape=(count,))
+    array = np.memmap(filename, dtype=dtype, mode="w+", shape=(count,))
+    array[:] = fill_value
+    array.flush()
+    return array
+
+
+def _prefilter_pairs(executor, prefilter, rows, columns, costs, done, method, max_workers, chunk_size):
+    """
+    Function to choose pairs computed exactly by a prefilter. Pairs not chosen are stored as infinite, and with the
+    distance method costs of candidates computed while choosing them are stored too, then all of them are marked as
+    computed at once.
+    :param executor: pool of processes with signals and params stored.
+    :param prefilter: Prefilter object.
+    :param rows: first signal of each pair.
+    :param columns: second signal of each pair.
+    :param costs: memory-mapped costs of pairs.
+    :param done: memory-mapped mask of computed pairs.
+    :param method: method to calculate alignment cost.
+    :param max_workers: maximum number of processes.
+    :param chunk_size: number of pairs whose bounds are computed by one task.
+    """
+    pairs = list(zip(rows.tolist(), columns.tolist()))
+    futures = [executor.submit(_pair_bounds, pairs[k:k + chunk_size], prefilter)
+               for k in range(0, len(pairs), chunk_size)]
+    bounds = [bound for future in futures for bound in future.result()]
+    computed = {}
+
+    def cost(positions, limit):
+        futures = [executor.submit(_pair_costs, [pairs[pos]], "d-method", limit) for pos in positions]
+        for pos, future in zip(positions, futures):
+            computed[pos] = future.result()[0]
+        return [computed[pos] for pos in positions]
+
+    chosen = set(prefilter.select(bounds, cost, batch=max_workers or os.cpu_count() or 1))
+    finished = [pos for pos in range(len(pairs)) if pos not in chosen or (method == "d-method" and pos in computed)]
+    for pos in finished:
+        costs[pos] = computed[pos] if pos in chosen else np.inf
+    costs.flush()
+    done[finished] = True
+    done.flush()
+
+
+def pairwise_costs(signals, filename, method="d-method", max_cost=None, max_workers=None, chunk_size=CHUNK_SIZE,
+                   prefilter=None, **params):
+    """
+    Function to calculate alignment costs of all pairs of signals, i.e. a condensed matrix of costs, for clustering.
+    The cost of a pair (i, j), i < j, is the cost of DTW of signal i and signal j, so each pair is computed once. Costs
+    are written to a file after every task of a pool, together with a mask of computed pairs, and a calculation
+    started again with the same signals and params computes only the remaining pairs.
+    :param signals: list of signals, which may have different lengths.
+    :param filename: name of a file to store a condensed matrix of float64 costs in, a mask of computed pairs and a key
+                     of signals and params are stored next to it (.done and .key files).
+    :param method: method to calculate alignment cost.
+    :param max_cost: maximum alignment cost using the distance method, None for no maximum. Pairs with a greater cost
+                     are stored as infinite, and most of them are skipped by lower bounds of cost or abandoned early,
+                     e.g. for clustering with a maximum distance of neighbours. Costs not greater are exact.
+    :param max_workers: maximum number of processes, by default chosen by ProcessPoolExecutor.
+    :param chunk_size: number of pairs computed by one task.
+    :param prefilter: Prefilter object choosing pairs computed exactly by lower bounds of their costs from reduced
+                      signals, None to compute all pairs. Other pairs are stored as infinite. Pairs are chosen before
+                      any of them is marked as computed, so a resumed calculation computes only the chosen ones left.
+                      Candidates are computed by the pool in batches of max_workers pairs.
+    :param params: params of DTW objects, e.g. var, constraint, radius or lag.
+    :return: condensed matrix of costs as a read-only memory-mapped array, positions of pairs are given by
+             condensed_index().
+    :raise ValueError: if there are less than two signals, a method is unknown, a maximum cost is used with a method
+                       other than the distance one, both a maximum cost and a prefilter are used, or a file holds
+                       costs of other signals or params.
+    """
+    if len(signals) < 2:
+        raise ValueError(f"At least two signals are required! Got {len(signals)} instead.")
+    if method not in ALIGNMENT_METHODS:
+        raise ValueError(f"Allowed methods to calculate alignment cost are: 'd-method', 'td-method' and 'c-method'. "
+                         f"Got '{method}' instead.")
+    if max_cost is not None and method != "d-method":
+        raise ValueError("Lower bounds of alignment cost are implemented only for the distance method!")
+    if max_cost is not None and prefilter is not None:
+        raise ValueError("Use a maximum cost of a prefilter instead of both!")
+    signals = [np.asarray(s) for s in signals]
+    count = len(signals) * (len(signals) - 1) // 2
+    key = ResultCache.key(signals, method=method, max_cost=max_cost,
+                          prefilter=None if prefilter is None else vars(prefilter), **params)
+    resume = os.path.exists(f"{filename}.key")
+    if resume:
+        with open(f"{filename}.key") as file:
+            if file.read() != key:
+                raise ValueError(f"File '{filename}' holds costs of other signals or params!")
+    costs = _open_memmap(filename, float, count, np.nan, resume)
+    done = _open_memmap(f"{filename}.done", bool, count, False, resume)
+    if not resume:
+        with open(f"{filename}.key", "w") as file:
+            file.write(key)
+    rows, columns = np.triu_indices(len(signals), 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(signals, params)) as executor:
+        if prefilter is not None and not done.any():
+            _prefilter_pairs(executor, prefilter, rows, columns, costs, done, method, max_workers, chunk_size)
+        positions = np.flatnonzero(~done)
+        chunks = [positions[k:k + chunk_size] for k in range(0, len(positions), chunk_size)]
+        futures = {executor.submit(_pair_costs, list(zip(rows[chunk].tolist(), columns[chunk].tolist())), method,
+                                   max_cost): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            # costs are stored before they are marked as computed, so a mask never points to missing costs
+            costs[chunk] = future.result()
+            costs.flush()
+            done[chunk] = True
+            done.flush()
+    del costs, done
+    return np.memmap(filename, dtype=float, mode="r", shape=(count,))
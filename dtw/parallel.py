@@ -0,0 +1,77 @@
+"""
+@author: Radoslaw Plawecki
+Evaluation of DTW for many pairs of signals at once by a pool of threads. NumPy releases the GIL inside
+vectorized operations, so the wavefront engine computes anti-diagonals of different pairs on many cores of
+one process. The loop engine runs Python code cell by cell and does not benefit from threads.
+"""
+
+from project.dtw.dtw import ALIGNMENT_COSTS_DTYPE, ALIGNMENT_METHODS, DTW
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import os
+
+
+def _map_pairs(task, pairs, max_workers, params):
+    """
+    Function to run a task on DTW objects of pairs of signals in a pool of threads.
+    :param task: function of a DTW object returning a result for a pair.
+    :param pairs: list of (x, y) pairs of signals.
+    :param max_workers: maximum number of threads, by default chosen by ThreadPoolExecutor.
+    :param params: params of DTW objects, e.g. var, engine or constraint.
+    :return: list of results in the order of pairs.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda pair: task(DTW(*pair, **params)), pairs))
+
+
+def alignment_costs(pairs, method, max_workers=None, prefilter=None, **params):
+    """
+    Function to calculate alignment costs of many pairs of signals concurrently.
+    :param pairs: list of (x, y) pairs of signals.
+    :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+    :param max_workers: maximum number of threads, by default chosen by ThreadPoolExecutor.
+    :param prefilter: Prefilter object choosing pairs computed exactly by lower bounds of their costs from reduced
+                      signals, None to compute all pairs. Other pairs have infinite costs. Candidates are computed by
+                      threads in batches of max_workers pairs, abandoned early when they cannot be among the best ones.
+    :param params: params of DTW objects, e.g. var, engine or constraint.
+    :return: list with alignment costs in the order of pairs (structured arrays for method='all').
+    """
+    if prefilter is not None:
+        dtws = _map_pairs(lambda dtw: dtw, pairs, max_workers, params)
+        skipped = (np.array((np.inf,) * len(ALIGNMENT_METHODS), dtype=ALIGNMENT_COSTS_DTYPE) if method == "all"
+                   else np.inf)
+        results = [skipped] * len(pairs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            bounds = list(executor.map(lambda dtw: dtw.calc_lower_bound(prefilter), dtws))
+
+            def cost(positions, limit):
+                return list(executor.map(lambda pos: dtws[pos].calc_bounded_alignment_cost(limit), positions))
+
+            # candidates are computed by all threads at once, and their distances are kept by DTW objects, so the
+            # distance method does not compute chosen pairs again
+            chosen = prefilter.select(bounds, cost, batch=max_workers or os.cpu_count() or 1)
+            task = ((lambda dtw: dtw.calc_alignment_costs()) if method == "all" else
+                    (lambda dtw: dtw.calc_alignment_cost(method=method)))
+            for pos, alignment_cost in zip(chosen, executor.map(lambda pos: task(dtws[pos]), chosen)):
+                results[pos] = alignment_cost
+        return results
+    if method == "all":
+        return _map_pairs(lambda dtw: dtw.calc_alignment_costs(), pairs, max_workers, params)
+    return _map_pairs(lambda dtw: dtw.calc_alignment_cost(method=method), pairs, max_workers, params)
+
+
+def sliding_window_costs(pairs, window_size, step, method, batch=False, max_workers=None, prefilter=None, **params):
+    """
+    Function to implement DTW with sliding window for many pairs of signals concurrently.
+    :param pairs: list of (x, y) pairs of signals.
+    :param window_size: size of a window.
+    :param step: step between windows.
+    :param method: method to calculate alignment cost, 'all' to calculate costs using all methods at once.
+    :param batch: whether to compute all windows of a pair at once instead of window by window.
+    :param max_workers: maximum number of threads, by default chosen by ThreadPoolExecutor.
+    :param prefilter: Prefilter object choosing windows of each pair computed exactly, None to compute all windows.
+    :param params: params of DTW objects, e.g. var, engine or constraint.
+    :return: list with results of sliding_window_dtw, i.e. alignment costs, windows and matrices, in the order of pairs.
+    """
+    return _map_pairs(lambda dtw: dtw.sliding_window_dtw(window_size, step, method, batch=batch, prefilter=prefilter),
+                      pairs, max_workers, params)
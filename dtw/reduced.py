@@ -0,0 +1,197 @@
+"""
+@author: Radoslaw Plawecki
+Reduced representations of signals, i.e. means of segments (PAA) and symbols of segments (SAX), and a lower bound of
+DTW computed from them, used to skip comparisons which cannot be among the best ones.
+Sources:
+[1] Keogh, E., Chakrabarti, K., Pazzani, M., Mehrotra, S. (2001). Dimensionality reduction for fast similarity search
+in large time series databases. Knowledge and Information Systems, 3(3), 263-286.
+[2] Lin, J., Keogh, E., Wei, L., Lonardi, S. (2007). Experiencing SAX: a novel symbolic representation of time series.
+Data Mining and Knowledge Discovery, 15(2), 107-144.
+[3] Keogh, E., Ratanamahatana, C. A. (2005). Exact indexing of dynamic time warping. Knowledge and Information
+Systems, 7(3), 358-386.
+"""
+
+from project.dtw.bounds import envelopes, lb_kim, relative_tolerance, transpose_bounds
+from scipy.stats import norm
+import heapq
+import numpy as np
+
+# default number of segments of a reduced signal
+SEGMENTS = 16
+
+
+def segment_starts(n, segments):
+    """
+    Function to divide samples into segments of almost equal lengths.
+    :param n: number of samples.
+    :param segments: number of segments, at most the number of samples.
+    :return: first sample of each segment.
+    """
+    return np.unique(np.linspace(0, n, min(segments, n) + 1).astype(int)[:-1])
+
+
+def paa(s, segments=SEGMENTS):
+    """
+    Function to calculate the piecewise aggregate approximation (PAA) of a signal, i.e. means of its segments.
+    :param s: signal, or an array of signals with samples along the last axis.
+    :param segments: number of segments.
+    :return: means of segments.
+    """
+    s = np.asarray(s, dtype=float)
+    starts = segment_starts(s.shape[-1], segments)
+    return np.add.reduceat(s, starts, axis=-1) / np.diff(np.append(starts, s.shape[-1]))
+
+
+def sax(s, breakpoints, segments=SEGMENTS):
+    """
+    Function to calculate the symbolic aggregate approximation (SAX) of a signal, i.e. numbers of intervals between
+    breakpoints which means of its segments fall into.
+    :param s: signal, or an array of signals with samples along the last axis.
+    :param breakpoints: increasing breakpoints of intervals, e.g. from gaussian_breakpoints().
+    :param segments: number of segments.
+    :return: symbols of segments, from 0 to the number of breakpoints.
+    """
+    return np.searchsorted(breakpoints, paa(s, segments), side="right")
+
+
+def gaussian_breakpoints(s, alphabet):
+    """
+    Function to get breakpoints dividing the normal distribution with the mean and the standard deviation of samples
+    into intervals of equal probability, so symbols of a signal are about equally frequent.
+    :param s: samples of signals.
+    :param alphabet: number of symbols.
+    :return: increasing breakpoints.
+    """
+    s = np.asarray(s, dtype=float)
+    # any breakpoints give a valid bound, so a constant signal uses the standard deviation of 1
+    return norm.ppf(np.arange(1, alphabet) / alphabet, loc=np.mean(s), scale=np.std(s) or 1.0)
+
+
+def _segment_gaps(s, lower, upper, starts, breakpoints, tolerance):
+    """
+    Function to calculate LB_Keogh of segments from their sums, i.e. distances of sums of samples of a signal to sums of
+    envelopes of the other one. A sum of distances of samples is never lower than the distance of their sums, and with
+    symbols the distance of intervals of means is never greater.
+    :param s: signals with samples along the last axis.
+    :param lower: lower envelopes of the other signals.
+    :param upper: upper envelopes of the other signals.
+    :param starts: first sample of each segment.
+    :param breakpoints: breakpoints of symbols, None to use sums of segments.
+    :param tolerance: relative margin of sums protecting against rounding.
+    :return: lower bound of the distance of each segment.
+    """
+    sums = [np.add.reduceat(a, starts, axis=-1) for a in (s, lower, upper)]
+    # sums of values of different signs are rounded relative to sums of their absolute values
+    margin = tolerance * (np.add.reduceat(np.abs(s), starts, axis=-1) +
+                          np.add.reduceat(np.maximum(np.abs(lower), np.abs(upper)), starts, axis=-1))
+    if breakpoints is None:
+        s_low, s_high, lower_low, upper_high = sums[0], sums[0], sums[1], sums[2]
+    else:
+        widths = np.diff(np.append(starts, s.shape[-1]))
+        edges = np.concatenate(([-np.inf], breakpoints, [np.inf]))
+        symbols = [np.searchsorted(breakpoints, total / widths, side="right") for total in sums]
+        s_low, s_high = edges[symbols[0]] * widths, edges[symbols[0] + 1] * widths
+        lower_low, upper_high = edges[symbols[1]] * widths, edges[symbols[2] + 1] * widths
+    return np.maximum(np.maximum(s_low - upper_high, lower_low - s_high) - margin, 0)
+
+
+class Prefilter:
+    def __init__(self, segments=SEGMENTS, alphabet=None, max_cost=np.inf, candidates=None):
+        """
+        Method to initialize params of a class. A prefilter computes lower bounds of alignment costs using the
+        distance method from reduced signals, and only comparisons which may pass are computed exactly. Both a maximum
+        cost and a number of candidates give exactly the same costs of computed comparisons as without a prefilter.
+        :param segments: number of segments of reduced signals.
+        :param alphabet: number of symbols of SAX, None to use PAA. Symbols give looser bounds than means of segments.
+        :param max_cost: maximum alignment cost using the distance method, comparisons whose lower bound is greater
+                         are skipped, so all comparisons with a cost not greater are computed.
+        :param candidates: number of comparisons with the lowest alignment costs using the distance method computed
+                           exactly, None for all comparisons not greater than a maximum cost.
+        """
+        if segments < 1:
+            raise ValueError(f"Number of segments must have a positive value! Got {segments} instead.")
+        if alphabet is not None and alphabet < 2:
+            raise ValueError(f"Alphabet of SAX must have at least 2 symbols! Got {alphabet} instead.")
+        if candidates is not None and candidates < 1:
+            raise ValueError(f"Number of candidates must have a positive value! Got {candidates} instead.")
+        self.segments, self.alphabet, self.max_cost, self.candidates = segments, alphabet, max_cost, candidates
+
+    def breakpoints(self, x, y):
+        """
+        Method to get breakpoints of symbols of signals, shared by all their windows, so their bounds are valid.
+        :param x: first signal.
+        :param y: second signal.
+        :return: breakpoints for each dimension of signals, None without SAX.
+        """
+        if self.alphabet is None:
+            return None
+        x, y = np.asarray(x), np.asarray(y)
+        x, y = x.reshape(len(x), -1), y.reshape(len(y), -1)
+        return [gaussian_breakpoints(np.concatenate((x[:, k], y[:, k])), self.alphabet) for k in range(x.shape[1])]
+
+    def lower_bounds(self, x, y, lo, hi, breakpoints=None, multivariate=False):
+        """
+        Method to calculate lower bounds of the last cell of a matrix from reduced signals, the tightest of LB_Kim and
+        LB_Keogh of segments of both signals against each other.
+        :param x: first signal, or an array of signals with samples along the last axis.
+        :param y: second signal, or an array of signals with samples along the last axis.
+        :param lo: first allowed column for each row.
+        :param hi: column after the last allowed one for each row.
+        :param breakpoints: breakpoints of symbols for each dimension from breakpoints(), None without SAX.
+        :param multivariate: whether signals are multivariate, with samples along the second to last axis and
+                             dimensions along the last one.
+        :return: lower bound of the last cell of a matrix.
+        """
+        if multivariate:
+            x, y = np.moveaxis(x, -1, 0), np.moveaxis(y, -1, 0)
+        else:
+            x, y = x[np.newaxis], y[np.newaxis]
+        n, m = x.shape[-1], y.shape[-1]
+        tolerance = relative_tolerance(np.result_type(x, y, np.float32), (n + m) * len(x))
+        x_lower, x_upper = envelopes(x, *transpose_bounds(lo, hi, m))
+        y_lower, y_upper = envelopes(y, lo, hi)
+        x_starts, y_starts = segment_starts(n, self.segments), segment_starts(m, self.segments)
+        x_bound, y_bound = 0, 0
+        for k in range(len(x)):
+            dimension_breakpoints = None if breakpoints is None else breakpoints[k]
+            x_bound = x_bound + _segment_gaps(x[k], y_lower[k], y_upper[k], x_starts, dimension_breakpoints,
+                                              tolerance).sum(axis=-1)
+            y_bound = y_bound + _segment_gaps(y[k], x_lower[k], x_upper[k], y_starts, dimension_breakpoints,
+                                              tolerance).sum(axis=-1)
+        return np.maximum(np.maximum(lb_kim(x, y).sum(axis=0), x_bound), y_bound) * (1 - tolerance)
+
+    def select(self, bounds, cost, batch=1):
+        """
+        Method to choose comparisons computed exactly. Comparisons are visited from the lowest bound, and with a number
+        of candidates the visit stops when a bound is greater than the cost of the last candidate. Comparisons of a
+        batch are computed with the same limit, which is the cost of the last candidate before the batch, so they may be
+        computed concurrently and the chosen comparisons are the same for every size of a batch.
+        :param bounds: lower bounds of alignment costs using the distance method.
+        :param cost: function of a list of positions of comparisons and a limit of their costs, returning the alignment
+                     cost using the distance method of each comparison, or an infinite cost if it is greater than a
+                     limit.
+        :param batch: maximum number of comparisons computed at once, e.g. the number of threads computing them.
+        :return: positions of chosen comparisons in increasing order.
+        """
+        order = np.argsort(bounds, kind="stable").tolist()
+        if self.candidates is None:
+            return sorted(pos for pos in order if bounds[pos] <= self.max_cost)
+        # candidates as a heap with the worst one first
+        best = []
+        k = 0
+        while k < len(order):
+            worst = -best[0][0] if len(best) == self.candidates else self.max_cost
+            positions = []
+            while k < len(order) and len(positions) < batch and bounds[order[k]] <= worst:
+                positions.append(order[k])
+                k += 1
+            if not positions:
+                break
+            for pos, alignment_cost in zip(positions, cost(positions, worst)):
+                if alignment_cost > self.max_cost:
+                    continue
+                if len(best) < self.candidates:
+                    heapq.heappush(best, (-alignment_cost, -pos))
+                elif (alignment_cost, pos) < (-best[0][0], -best[0][1]):
+                    heapq.heapreplace(best, (-alignment_cost, -pos))
+        return sorted(-pos for _, pos in best)
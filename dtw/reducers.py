@@ -0,0 +1,47 @@
+"""
+@author: Radoslaw Plawecki
+Reducers of alignment costs computed one by one, e.g. per window of signals, which keep only their current state.
+"""
+
+import math
+import numpy as np
+
+
+def streaming_mean(values):
+    """
+    Function to calculate the mean of values in constant memory. The sum is exactly rounded, so it does not depend on
+    the order or the number of values.
+    :param values: iterable of values.
+    :return: mean of values, NaN if there are no values.
+    """
+    count = 0
+
+    def counted():
+        nonlocal count
+        for value in values:
+            count += 1
+            yield value
+
+    total = math.fsum(counted())
+    return total / count if count else np.nan
+
+
+def streaming_extreme(items, min_max):
+    """
+    Function to find the minimum or maximum value in constant memory, together with labels of all items with this value.
+    :param items: iterable of (label, value) pairs, e.g. windows with their alignment costs.
+    :param min_max: MIN/MAX, whether to look for minimum or maximum value.
+    :return: minimum or maximum value and the list with labels of items with this value (argmin or argmax).
+    :raise ValueError: if value for min_max is not an expected one or there are no items.
+    """
+    if min_max not in ("MIN", "MAX"):
+        raise ValueError(f"Allowed extremes are 'MIN' and 'MAX'! Got {min_max} instead.")
+    best, labels = None, []
+    for label, value in items:
+        if best is None or (value < best if min_max == "MIN" else value > best):
+            best, labels = value, [label]
+        elif value == best:
+            labels.append(label)
+    if best is None:
+        raise ValueError("There are no values to look for minimum or maximum in!")
+    return best, labels
@@ -0,0 +1,68 @@
+"""
+@author: Radoslaw Plawecki
+"""
+
+import numpy as np
+
+
+class DTWResult:
+    def __init__(self, path, path_costs, matches, insertions, deletions, matrix=None):
+        """
+        Method to initialize params of a class. The result is immutable, so it can be shared by all cost methods,
+        statistics and plots of a DTW object.
+        :param path: warping path as an array of (i, j) pairs of signal indices, from the last pair to the first one.
+        :param path_costs: values of a filled matrix along a warping path.
+        :param matches: number of matches.
+        :param insertions: number of insertions.
+        :param deletions: number of deletions.
+        :param matrix: filled matrix as BandedMatrix object, None if a path was found without a full matrix.
+        """
+        if matrix is not None:
+            matrix.values.setflags(write=False)
+        path = np.array(path, dtype=np.int64).reshape(-1, 2)
+        path.setflags(write=False)
+        self.__matrix, self.__path, self.__path_costs = matrix, path, tuple(path_costs)
+        self.__statistics = (matches, insertions, deletions)
+
+    @property
+    def matrix(self):
+        """
+        Method to get a filled matrix with cells only inside a global constraint.
+        :return: filled matrix as BandedMatrix object, None if a path was found without a full matrix.
+        """
+        return self.__matrix
+
+    @property
+    def cost_matrix(self):
+        """
+        Method to get a full filled matrix.
+        :return: filled matrix, cells outside a global constraint are infinite, None if a path was found without
+                 a full matrix.
+        """
+        if self.__matrix is None:
+            return None
+        return self.__matrix.to_dense()
+
+    @property
+    def path(self):
+        """
+        Method to get a warping path.
+        :return: array of (i, j) pairs of signal indices, from the last pair to the first one.
+        """
+        return self.__path
+
+    @property
+    def statistics(self):
+        """
+        Method to get statistics of a warping path.
+        :return: number of matches, insertions and deletions.
+        """
+        return self.__statistics
+
+    @property
+    def path_costs(self):
+        """
+        Method to get values of a filled matrix along a warping path.
+        :return: values in the order of a path.
+        """
+        return self.__path_costs
@@ -0,0 +1,85 @@
+"""
+@author: Radoslaw Plawecki
+Subsequence DTW, i.e. search for spans of a long signal most similar to a short query, in one pass over the signal.
+Sources:
+[1] Sakurai, Y., Faloutsos, C., Yamamuro, M. (2007). Stream monitoring under the time warping distance. Proceedings
+of the 23rd International Conference on Data Engineering, 1046-1055.
+"""
+
+from project.dtw.kernels import choose_step, cost_dtype, local_distance, signal_dimensions
+import numpy as np
+
+# record with a span of a signal, from its first sample to the sample after the last one, and its cost
+SPAN_DTYPE = np.dtype([("start", np.int64), ("stop", np.int64), ("cost", float)])
+
+
+def match_ends(query, series):
+    """
+    Function to calculate the cost of the best span of a signal ending at each of its samples (SPRING). A warping path
+    may start at any sample of a signal (open begin) and end at any one (open end), so the matrix has an initial row of
+    zeros, and the first sample of a span is carried along a path. The matrix is computed along anti-diagonals as in
+    the wavefront engine, keeping only three anti-diagonals in memory, so a signal is read once and the time is linear
+    in its length for a given query. Each cell is computed with the same operations as in the other engines, so the
+    cost of a span is exactly the DTW distance of a query and this span.
+    :param query: searched signal.
+    :param series: signal to search in, with the same number of dimensions as a query.
+    :return: cost of the best span ending at each sample of a signal and the first sample of this span.
+    """
+    dtype = cost_dtype(query, series)
+    x, y = signal_dimensions(query, series)
+    n, m = x.shape[1], y.shape[1]
+    y_reversed = y[:, ::-1]
+    costs, starts = np.full(m, np.inf, dtype=dtype), np.zeros(m, dtype=np.int64)
+    diagonals = [np.full(n + 1, np.inf, dtype=dtype) for _ in range(3)]
+    first_samples = [np.zeros(n + 1, dtype=np.int64) for _ in range(3)]
+    # cell (0, j) of anti-diagonal j starts a span at sample j, cells (i, 0) are never reached
+    for d in range(2):
+        diagonals[d][0], first_samples[d][0] = 0, d
+    for d in range(2, n + m + 1):
+        two_before, before, current = diagonals[(d - 2) % 3], diagonals[(d - 1) % 3], diagonals[d % 3]
+        starts_two_before, starts_before, starts_current = (first_samples[(d - 2) % 3], first_samples[(d - 1) % 3],
+                                                            first_samples[d % 3])
+        current[0], starts_current[0] = 0, d
+        # cell (d, 0) is the only one of an anti-diagonal not written before, others are overwritten or never read
+        if d <= n:
+            current[d] = np.inf
+        i_start, i_stop = max(1, d - m), min(n, d - 1) + 1
+        component, step = choose_step(two_before[i_start - 1:i_stop - 1], before[i_start - 1:i_stop - 1],
+                                      before[i_start:i_stop])
+        distance = local_distance(x[:, i_start - 1:i_stop - 1], y_reversed[:, m - d + i_start:m - d + i_stop])
+        current[i_start:i_stop] = distance + component
+        starts_current[i_start:i_stop] = np.choose(step, (starts_two_before[i_start - 1:i_stop - 1],
+                                                          starts_before[i_start - 1:i_stop - 1],
+                                                          starts_before[i_start:i_stop]))
+        if i_stop == n + 1:
+            costs[d - n - 1], starts[d - n - 1] = current[n], starts_current[n]
+    return costs, starts
+
+
+def find_subsequences(query, series, k=1, max_cost=np.inf):
+    """
+    Function to find spans of a signal most similar to a query. The best span ending at each sample is found by
+    match_ends, then spans are chosen from the cheapest one, skipping spans overlapping the ones already chosen, so
+    neighbouring ends of the same occurrence of a query are reported once.
+    :param query: searched signal.
+    :param series: signal to search in, with the same number of dimensions as a query.
+    :param k: maximum number of spans.
+    :param max_cost: maximum cost of a span, infinite by default.
+    :return: structured array with the first sample, the sample after the last one and the cost of spans, from the
+             cheapest one.
+    :raise ValueError: if a query or a signal is empty or the number of spans is not positive.
+    """
+    if len(query) == 0 or len(series) == 0:
+        raise ValueError("Query and signal must not be empty!")
+    if k < 1:
+        raise ValueError(f"Number of spans must have a positive value! Got {k} instead.")
+    costs, starts = match_ends(query, series)
+    spans = []
+    for end in np.argsort(costs, kind="stable").tolist():
+        cost = costs[end]
+        if not cost <= max_cost or len(spans) == k:
+            break
+        start, stop = int(starts[end]), end + 1
+        if all(stop <= other_start or start >= other_stop for other_start, other_stop, _ in spans):
+            spans.append((start, stop, cost))
+    return np.array(spans, dtype=SPAN_DTYPE)
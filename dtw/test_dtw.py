@@ -4,8 +4,26 @@
 
 import unittest
 import numpy as np
+import matplotlib.pyplot as plt
 from dtw import DTW
+from band import BandedMatrix, band_bounds
+from hirschberg import trace_path_linear
+from kernels import distance_wavefront, fill_tiled, fill_wavefront, trace_paths_batch
+from parallel import alignment_costs, sliding_window_costs
+from benchmark import fastdtw_error
+from reducers import streaming_extreme, streaming_mean
+from cache import ResultCache
+from lag import estimate_lag
+from subsequence import match_ends
+from online import OnlineDTW
+from pairwise import condensed_index, pairwise_costs
+from knn import WindowIndex
+from reduced import Prefilter, gaussian_breakpoints, paa, sax
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
+import os
+import pickle
+import tempfile
 
 
 class TestDTW(unittest.TestCase):
@@ -27,6 +45,360 @@ class TestDTW(unittest.TestCase):
         ])
         np.testing.assert_array_equal(result, expected_result)
 
+    def test_fill_matrix_wavefront_equals_loop(self):
+        rng = np.random.default_rng(0)
+        x, y = rng.normal(size=37), rng.normal(size=23)
+        result = DTW(x, y, engine="wavefront").fill_matrix()
+        expected_result = DTW(x, y, engine="loop").fill_matrix()
+        np.testing.assert_array_equal(result, expected_result)
+
+    def test_float32_within_tolerance(self):
+        rng = np.random.default_rng(14)
+        x, y = np.cumsum(rng.normal(size=120)), np.cumsum(rng.normal(size=100))
+        result = DTW(x, y, dtype=np.float32)
+        self.assertEqual(result.fill_matrix().dtype, np.float32)
+        np.testing.assert_array_equal(result.fill_matrix(), DTW(x, y, dtype=np.float32, engine="loop").fill_matrix())
+        expected_result = DTW(x, y).calc_alignment_cost(method='d-method')
+        self.assertLessEqual(abs(result.calc_alignment_cost(method='d-method') - expected_result),
+                             220 * np.finfo(np.float32).eps * expected_result)
+        with self.assertRaises(ValueError):
+            DTW(x, y, dtype=int)
+
+    def test_float32_path_dependent_costs(self):
+        rng = np.random.default_rng(13)
+        eps = np.finfo(np.float32).eps
+        paths_differ = False
+        for _ in range(40):
+            x, y = rng.normal(size=50), rng.normal(size=40)
+            result, expected_result = DTW(x, y, dtype=np.float32), DTW(x, y)
+            cells, expected_cells = result.fill_matrix().astype(float), expected_result.fill_matrix()
+            np.testing.assert_allclose(cells[1:, 1:], expected_cells[1:, 1:], rtol=90 * eps, atol=0)
+            # costs of the time-distance method are bounded only when both types give the same path
+            if np.array_equal(result.result.path, expected_result.result.path):
+                self.assertLessEqual(abs(result.calc_alignment_cost(method='td-method') -
+                                         expected_result.calc_alignment_cost(method='td-method')),
+                                     90 * eps * expected_result.calc_alignment_cost(method='td-method'))
+            else:
+                paths_differ = True
+        self.assertTrue(paths_differ)
+
+    def test_fill_tiled_equals_wavefront(self):
+        rng = np.random.default_rng(15)
+        x, y = rng.normal(size=37), rng.normal(size=23)
+        for params in [{}, {"constraint": "sakoe-chiba", "radius": 3}, {"constraint": "itakura", "slope": 2}]:
+            lo, hi = band_bounds(len(x), len(y), **params)
+            expected_result, expected_steps = BandedMatrix.initialized(lo, hi), BandedMatrix(lo, hi, -1, np.int8)
+            fill_wavefront(x, y, expected_result, expected_steps)
+            for tile in [1, 7, 64]:
+                result = BandedMatrix.initialized(lo, hi, on_disk=True)
+                steps = BandedMatrix(lo, hi, -1, np.int8, on_disk=True)
+                fill_tiled(x, y, result, steps, tile=tile)
+                self.assertIsInstance(result.values, np.memmap)
+                np.testing.assert_array_equal(result.to_dense(), expected_result.to_dense())
+                np.testing.assert_array_equal(steps.values, expected_steps.values)
+
+    def test_tiled_engine(self):
+        rng = np.random.default_rng(16)
+        x, y = rng.normal(size=(50, 2)), rng.normal(size=(45, 2))
+        for params in [{}, {"constraint": "sakoe-chiba", "radius": 5}]:
+            dtw = DTW(x, y, engine="tiled", **params)
+            expected_result = DTW(x, y, **params)
+            np.testing.assert_array_equal(dtw.fill_matrix(), expected_result.fill_matrix())
+            self.assertEqual(dtw.calc_alignment_costs(), expected_result.calc_alignment_costs())
+            np.testing.assert_array_equal(dtw.result.path, expected_result.result.path)
+            # dense views of a matrix stored on disk are stored on disk too
+            self.assertIsInstance(dtw.fill_matrix(), np.memmap)
+            self.assertIsInstance(dtw.traceback(), np.memmap)
+            np.testing.assert_array_equal(dtw.traceback(), expected_result.traceback())
+
+    def test_engine_error(self):
+        with self.assertRaises(ValueError):
+            DTW([0, 1], [1, 0], engine="N/A")
+
+    def test_sakoe_chiba_wavefront_equals_loop(self):
+        rng = np.random.default_rng(1)
+        x, y = rng.normal(size=40), rng.normal(size=31)
+        result = DTW(x, y, constraint="sakoe-chiba", radius=3).fill_matrix()
+        expected_result = DTW(x, y, engine="loop", constraint="sakoe-chiba", radius=3).fill_matrix()
+        np.testing.assert_array_equal(result, expected_result)
+
+    def test_itakura_wavefront_equals_loop(self):
+        rng = np.random.default_rng(2)
+        x, y = rng.normal(size=30), rng.normal(size=35)
+        result = DTW(x, y, constraint="itakura", slope=2).fill_matrix()
+        expected_result = DTW(x, y, engine="loop", constraint="itakura", slope=2).fill_matrix()
+        np.testing.assert_array_equal(result, expected_result)
+
+    def test_sakoe_chiba_wide_band_equals_unconstrained(self):
+        x = [0, 2, 0, 1, 0, 0]
+        y = [0, 0, 0.5, 2, 0, 1, 0]
+        result = DTW(x, y, constraint="sakoe-chiba", radius=10).fill_matrix()
+        np.testing.assert_array_equal(result, self.dtw.fill_matrix())
+
+    def test_sakoe_chiba_zero_radius_is_diagonal(self):
+        x, y = [0, 3, 6, 2, 4], [1, 1, 4, 2, 1]
+        dtw = DTW(x, y, constraint="sakoe-chiba", radius=0)
+        self.assertEqual(dtw.calc_alignment_cost(method='d-method'), 8 / 10)
+        self.assertEqual(dtw.get_statistics(), (5, 0, 0))
+
+    def test_estimate_lag(self):
+        rng = np.random.default_rng(19)
+        s = np.cumsum(rng.normal(size=700))
+        for lag in [-40, 0, 25]:
+            self.assertEqual(estimate_lag(s[100:600], s[100 - lag:600 - lag]), lag)
+        self.assertLessEqual(abs(estimate_lag(s[100:600], s[75:575], max_lag=10)), 10)
+        self.assertEqual(estimate_lag([1], [1, 2]), 0)
+
+    def test_lag_band(self):
+        rng = np.random.default_rng(20)
+        s = np.cumsum(rng.normal(size=260))
+        x, y = s[30:230], s[:200]
+        dtw = DTW(x, y, constraint="sakoe-chiba", radius=3, lag="auto")
+        self.assertEqual(dtw.lag, 30)
+        lo, hi = band_bounds(len(x), len(y), "sakoe-chiba", 3, lag=30)
+        self.assertEqual((lo[100], hi[100]), (127, 134))
+        self.assertLess(dtw.calc_alignment_cost(method='d-method'),
+                        DTW(x, y, constraint="sakoe-chiba", radius=3).calc_alignment_cost(method='d-method'))
+        expected_result = DTW(x, y, engine="loop", constraint="sakoe-chiba", radius=3, lag=30)
+        np.testing.assert_array_equal(dtw.fill_matrix(), expected_result.fill_matrix())
+        np.testing.assert_array_equal(dtw.traceback(), expected_result.traceback())
+        expected_result = dtw.sliding_window_dtw(window_size=40, step=15, method='all')[0]
+        result = dtw.sliding_window_dtw(window_size=40, step=15, method='all', batch=True)[0]
+        self.assertEqual(result.tolist(), expected_result.tolist())
+        with self.assertRaises(ValueError):
+            DTW(x, y, constraint="itakura", slope=2, lag=5)
+        with self.assertRaises(ValueError):
+            DTW(x, y, constraint="sakoe-chiba", radius=3, lag="N/A")
+
+    def test_match_ends(self):
+        rng = np.random.default_rng(21)
+        for shape in [(6,), (6, 2)]:
+            query, series = rng.normal(size=shape), rng.normal(size=(30,) + shape[1:])
+            costs, starts = match_ends(query, series)
+            for stop in range(1, len(series) + 1):
+                expected_result = min(DTW(query, series[start:stop]).fill_matrix()[-1, -1] for start in range(stop))
+                self.assertEqual(costs[stop - 1], expected_result)
+                result = DTW(query, series[starts[stop - 1]:stop]).fill_matrix()[-1, -1]
+                self.assertEqual(result, expected_result)
+
+    def test_find_subsequences(self):
+        rng = np.random.default_rng(22)
+        template = 3 * np.sin(np.linspace(0, 6, 50))
+        series = np.cumsum(rng.normal(scale=0.05, size=2000))
+        series[300:350] += template
+        series[1400:1460] += 3 * np.sin(np.linspace(0, 6, 60))
+        result = DTW(template, series).find_subsequences(k=3)
+        self.assertEqual(len(result), 3)
+        self.assertTrue(np.all(np.diff(result["cost"]) >= 0))
+        for start, stop in [(300, 350), (1400, 1460)]:
+            self.assertTrue(any(abs(span["start"] - start) <= 5 and abs(span["stop"] - stop) <= 5
+                                for span in result[:2]))
+        for first, second in [(0, 1), (0, 2), (1, 2)]:
+            self.assertTrue(result[first]["stop"] <= result[second]["start"] or
+                            result[second]["stop"] <= result[first]["start"])
+        result = DTW(template, series).find_subsequences(k=3, max_cost=result[0]["cost"])
+        self.assertEqual(len(result), 1)
+        with self.assertRaises(ValueError):
+            DTW(template, series).find_subsequences(k=0)
+
+    def test_online_dtw(self):
+        rng = np.random.default_rng(23)
+        for shape in [(80,), (80, 2)]:
+            x, y = np.cumsum(rng.normal(size=shape), axis=0), np.cumsum(rng.normal(size=shape), axis=0)
+            for radius in [0, 4]:
+                online_dtw = OnlineDTW(radius)
+                self.assertEqual(online_dtw.update(x[:3]), np.inf)
+                # the first signal is ahead until the second one catches up by two samples at once
+                for n, m in [(k + 3, k) for k in range(1, 40)] + [(k + 3, k + 3) for k in range(39, 78)]:
+                    result = online_dtw.update(x[online_dtw.n:n], y[online_dtw.m:m])
+                    if n == m:
+                        expected_result = DTW(x[:n], y[:m], constraint="sakoe-chiba", radius=radius)
+                        self.assertEqual(result, expected_result.calc_alignment_cost(method='d-method'))
+                self.assertEqual(online_dtw.distance, DTW(x, y, constraint="sakoe-chiba",
+                                                          radius=radius).fill_matrix()[-1, -1])
+        online_dtw = OnlineDTW(2)
+        online_dtw.update([0, 1, 2, 3], [0])
+        self.assertEqual(online_dtw.distance, np.inf)
+        with self.assertRaises(ValueError):
+            online_dtw.update(y=[[0, 1]])
+        with self.assertRaises(ValueError):
+            OnlineDTW(None)
+
+    def test_pairwise_costs(self):
+        rng = np.random.default_rng(24)
+        signals = [np.cumsum(rng.normal(size=length)) for length in rng.integers(30, 45, size=7)]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "costs.dat")
+            result = pairwise_costs(signals, filename, max_workers=2, chunk_size=4, constraint="sakoe-chiba", radius=5)
+            for i in range(len(signals)):
+                for j in range(i + 1, len(signals)):
+                    expected_result = DTW(signals[i], signals[j], constraint="sakoe-chiba", radius=5)
+                    self.assertEqual(result[condensed_index(len(signals), j, i)],
+                                     expected_result.calc_alignment_cost(method='d-method'))
+            max_cost = np.median(result)
+            expected_result = np.where(result <= max_cost, result, np.inf)
+            filename = os.path.join(directory, "bounded.dat")
+            result = pairwise_costs(signals, filename, max_cost=max_cost, max_workers=2, constraint="sakoe-chiba",
+                                    radius=5)
+            np.testing.assert_array_equal(result, expected_result)
+            # an interrupted calculation computes only pairs not marked as computed
+            done = np.memmap(f"{filename}.done", dtype=bool, mode="r+")
+            costs = np.memmap(filename, dtype=float, mode="r+")
+            done[3:9], costs[:9] = False, -1
+            done.flush()
+            costs.flush()
+            del done, costs
+            result = pairwise_costs(signals, filename, max_cost=max_cost, max_workers=2, constraint="sakoe-chiba",
+                                    radius=5)
+            np.testing.assert_array_equal(result[3:], expected_result[3:])
+            np.testing.assert_array_equal(result[:3], -1)
+            with self.assertRaises(ValueError):
+                pairwise_costs(signals, filename, max_workers=2)
+            with self.assertRaises(ValueError):
+                pairwise_costs(signals, filename, method='c-method', max_cost=1)
+            expected_result = pairwise_costs(signals, os.path.join(directory, "all.dat"), method='td-method',
+                                             max_workers=2, constraint="sakoe-chiba", radius=5)
+            distances = pairwise_costs(signals, os.path.join(directory, "distances.dat"), max_workers=2,
+                                       constraint="sakoe-chiba", radius=5)
+            order = sorted(range(len(distances)), key=lambda pos: (distances[pos], pos))
+            for method in ['d-method', 'td-method']:
+                filename = os.path.join(directory, f"{method}.dat")
+                result = pairwise_costs(signals, filename, method=method, max_workers=2,
+                                        prefilter=Prefilter(candidates=4), constraint="sakoe-chiba", radius=5)
+                self.assertEqual(list(np.flatnonzero(np.isfinite(result))), sorted(order[:4]))
+                expected_costs = distances if method == 'd-method' else expected_result
+                np.testing.assert_array_equal(result[order[:4]], expected_costs[order[:4]])
+            # a resumed calculation keeps the pairs chosen before
+            done = np.memmap(f"{filename}.done", dtype=bool, mode="r+")
+            done[order[0]] = False
+            done.flush()
+            del done
+            np.testing.assert_array_equal(pairwise_costs(signals, filename, method='td-method', max_workers=2,
+                                                         prefilter=Prefilter(candidates=4), constraint="sakoe-chiba",
+                                                         radius=5), result)
+            with self.assertRaises(ValueError):
+                pairwise_costs(signals, filename, max_cost=1, prefilter=Prefilter(max_cost=1))
+
+    def test_window_index(self):
+        rng = np.random.default_rng(25)
+        for shape, params in [((20,), {}), ((20,), {"constraint": "sakoe-chiba", "radius": 2}),
+                              ((20, 2), {"var": "DDTW", "constraint": "itakura", "slope": 2})]:
+            windows = np.cumsum(rng.normal(size=(120,) + shape), axis=1)
+            index = WindowIndex(20, segments=6, **params)
+            index.add(windows[:50])
+            index.add(windows[50:], labels=["B6"] * 70)
+            self.assertEqual(len(index), 120)
+            for query in [windows[7] + rng.normal(scale=0.1, size=shape), np.cumsum(rng.normal(size=shape), axis=0)]:
+                costs = [DTW(query, window, **params).calc_alignment_cost(method='d-method') for window in windows]
+                expected_result = sorted(zip(costs, range(len(windows))))[:4]
+                result = index.query(query, k=4)
+                self.assertEqual(list(zip(result["cost"], result["position"])), expected_result)
+        self.assertEqual(index.classify(windows[90], k=3), "B6")
+        with self.assertRaises(ValueError):
+            index.add(windows[:2, :, :1])
+        with self.assertRaises(ValueError):
+            WindowIndex(20).query(windows[0])
+
+    def test_paa_sax(self):
+        s = np.array([0, 2, 4, 6, 1, 1, 1, 1, 9])
+        np.testing.assert_array_equal(paa(s, segments=3), [2, 8 / 3, 11 / 3])
+        np.testing.assert_array_equal(sax(s, breakpoints=[1.5, 3], segments=3), [1, 1, 2])
+        self.assertEqual(len(gaussian_breakpoints(s, alphabet=4)), 3)
+
+    def test_prefilter(self):
+        rng = np.random.default_rng(26)
+        x, y = np.cumsum(rng.normal(size=300)), np.cumsum(rng.normal(size=300))
+        for params in [{}, {"constraint": "sakoe-chiba", "radius": 3}, {"var": "DDTW", "constraint": "itakura",
+                                                                          "slope": 2}]:
+            dtw = DTW(x, y, **params)
+            expected_result = np.array(dtw.sliding_window_dtw(window_size=30, step=4, method='d-method')[0])
+            order = sorted(range(len(expected_result)), key=lambda pos: (expected_result[pos], pos))
+            for prefilter in [Prefilter(candidates=5), Prefilter(segments=4, alphabet=6, candidates=5),
+                              Prefilter(max_cost=np.median(expected_result))]:
+                for batch in [False, True]:
+                    result = np.array(dtw.sliding_window_dtw(window_size=30, step=4, method='d-method', batch=batch,
+                                                             prefilter=prefilter)[0])
+                    computed = np.isfinite(result)
+                    np.testing.assert_array_equal(result[computed], expected_result[computed])
+                    if prefilter.candidates:
+                        self.assertEqual(list(np.flatnonzero(computed)), sorted(order[:5]))
+                    else:
+                        self.assertTrue(np.all(computed[expected_result <= prefilter.max_cost]))
+        # windows computed while choosing them are reused, so no distance is computed again without a limit
+        with patch("dtw.distance_wavefront", wraps=distance_wavefront) as kernel:
+            result = [cost for _, cost, _ in DTW(x, y).iter_sliding_window_dtw(
+                window_size=30, step=4, method='d-method', matrices=False, prefilter=Prefilter(candidates=5))]
+        self.assertEqual(np.isfinite(result).sum(), 5)
+        self.assertTrue(all(len(call.args) > 4 for call in kernel.call_args_list))
+        result = dtw.sliding_window_dtw(window_size=30, step=4, method='all', prefilter=Prefilter(candidates=2))[0]
+        self.assertEqual(np.isfinite(result['c-method']).sum(), 2)
+        pairs = [(rng.normal(size=40), rng.normal(size=35)) for _ in range(4)] + [(x[:40], x[:40] + 0.01)]
+        result = alignment_costs(pairs, method='td-method', max_workers=2, prefilter=Prefilter(candidates=1))
+        self.assertEqual(result[:4], [np.inf] * 4)
+        self.assertEqual(result[4], DTW(*pairs[4]).calc_alignment_cost(method='td-method'))
+        with self.assertRaises(ValueError):
+            Prefilter(alphabet=1)
+
+    def test_prefilter_candidates_of_pairs(self):
+        rng = np.random.default_rng(27)
+        s = np.cumsum(rng.normal(size=400))
+        pairs = [(s[:60], s[i:i + 60] + rng.normal(scale=0.1, size=60)) for i in range(0, 300, 15)]
+        expected_result = alignment_costs(pairs, method='d-method', constraint="sakoe-chiba", radius=4)
+        order = sorted(range(len(pairs)), key=lambda pos: (expected_result[pos], pos))
+        for max_workers in [1, 3, 8]:
+            result = alignment_costs(pairs, method='d-method', max_workers=max_workers,
+                                     prefilter=Prefilter(candidates=4), constraint="sakoe-chiba", radius=4)
+            self.assertEqual([pos for pos in range(len(pairs)) if np.isfinite(result[pos])], sorted(order[:4]))
+            for pos in order[:4]:
+                self.assertEqual(result[pos], expected_result[pos])
+        dtw = DTW(*pairs[order[-1]], constraint="sakoe-chiba", radius=4)
+        self.assertEqual(dtw.calc_bounded_alignment_cost(expected_result[order[0]]), np.inf)
+        self.assertEqual(dtw.calc_bounded_alignment_cost(np.inf), expected_result[order[-1]])
+        self.assertEqual(dtw.calc_alignment_cost(method='d-method'), expected_result[order[-1]])
+        # lower bounds of the whole matrix hold for a band of FastDTW
+        expected_result = DTW(*pairs[order[-1]], constraint="fastdtw", radius=1).calc_alignment_cost(method='d-method')
+        for max_cost in [expected_result, np.inf]:
+            dtw = DTW(*pairs[order[-1]], constraint="fastdtw", radius=1)
+            self.assertEqual(dtw.calc_bounded_alignment_cost(max_cost), expected_result)
+        dtw = DTW(*pairs[order[-1]], constraint="fastdtw", radius=1)
+        self.assertEqual(dtw.calc_bounded_alignment_cost(expected_result / 2), np.inf)
+
+    def test_constrained_cost_not_lower(self):
+        rng = np.random.default_rng(3)
+        x, y = rng.normal(size=25), rng.normal(size=25)
+        unconstrained = DTW(x, y).calc_alignment_cost(method='d-method')
+        for dtw in [DTW(x, y, constraint="sakoe-chiba", radius=2), DTW(x, y, constraint="itakura", slope=1.5)]:
+            self.assertGreaterEqual(dtw.calc_alignment_cost(method='d-method'), unconstrained)
+
+    def test_constraint_error(self):
+        with self.assertRaises(ValueError):
+            DTW([0, 1], [1, 0], constraint="N/A")
+        with self.assertRaises(ValueError):
+            DTW([0, 1], [1, 0], constraint="sakoe-chiba")
+        with self.assertRaises(ValueError):
+            DTW([0, 1], [1, 0], constraint="itakura", slope=0.5)
+        with self.assertRaises(ValueError):
+            DTW([0, 1], [1, 0], constraint="fastdtw")
+
+    def test_fastdtw_not_lower_than_exact(self):
+        rng = np.random.default_rng(12)
+        x, y = np.cumsum(rng.normal(size=300)), np.cumsum(rng.normal(size=270))
+        expected_result = DTW(x, y).calc_alignment_costs()
+        for radius in [0, 2, 10]:
+            result = DTW(x, y, constraint="fastdtw", radius=radius).calc_alignment_costs()
+            self.assertGreaterEqual(result['d-method'], expected_result['d-method'])
+        result = DTW(x, y, constraint="fastdtw", radius=300).calc_alignment_costs()
+        self.assertEqual(result, expected_result)
+
+    def test_fastdtw_error(self):
+        rng = np.random.default_rng(13)
+        pairs = [(rng.normal(size=60), rng.normal(size=50)) for _ in range(3)]
+        errors, max_error, mean_error = fastdtw_error(pairs, method='d-method', radius=60)
+        np.testing.assert_array_equal(errors, np.zeros(3))
+        errors, max_error, mean_error = fastdtw_error(pairs, method='d-method', radius=1)
+        self.assertTrue(np.all(errors >= 0))
+        self.assertEqual(max_error, np.max(errors))
+
     def test_traceback(self):
         result = self.dtw.traceback()
         expected_result = np.array([
@@ -40,10 +412,92 @@ class TestDTW(unittest.TestCase):
         ])
         np.testing.assert_array_equal(result, expected_result)
 
+    def test_result_computed_once(self):
+        result = self.dtw.result
+        self.dtw.calc_alignment_cost(method='td-method')
+        self.dtw.get_statistics()
+        self.assertIs(self.dtw.result, result)
+        self.assertIs(self.dtw.fill_matrix(), result.cost_matrix)
+        self.assertEqual(result.statistics, (5, 1, 2))
+
+    def test_result_immutable(self):
+        result = self.dtw.result
+        with self.assertRaises(ValueError):
+            result.cost_matrix[1, 1] = 0
+        with self.assertRaises(AttributeError):
+            result.path = []
+
+    def test_result_shared_by_threads(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: self.dtw.result, range(8)))
+        for result in results:
+            self.assertIs(result, results[0])
+
+    def test_pickle_round_trip(self):
+        expected_costs = self.dtw.calc_alignment_costs()
+        for dtw in (DTW(self.dtw.x, self.dtw.y), self.dtw):
+            restored = pickle.loads(pickle.dumps(dtw))
+            self.assertEqual(restored.calc_alignment_costs(), expected_costs)
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(lambda _: restored.result, range(8)))
+            for result in results:
+                self.assertIs(result, results[0])
+
+    def test_linear_path_equals_matrix_path(self):
+        rng = np.random.default_rng(5)
+        x, y = rng.normal(size=53), rng.normal(size=41)
+        for params in [{}, {"constraint": "sakoe-chiba", "radius": 5}, {"constraint": "itakura", "slope": 2}]:
+            expected_result = DTW(x, y, **params).result
+            lo, hi = band_bounds(len(x), len(y), **params)
+            path, path_costs, matches, insertions, deletions = trace_path_linear(x, y, lo, hi, block_cells=50)
+            np.testing.assert_array_equal(np.array(path), expected_result.path)
+            self.assertEqual(tuple(path_costs), expected_result.path_costs)
+            self.assertEqual((matches, insertions, deletions), expected_result.statistics)
+
+    def test_linear_path_inside_narrow_bands(self):
+        rng = np.random.default_rng(6)
+        x, y = np.cumsum(rng.normal(size=400)), np.cumsum(rng.normal(size=380))
+        for params in [{"constraint": "sakoe-chiba", "radius": 3, "lag": -10}, {"constraint": "fastdtw", "radius": 2}]:
+            expected_result = DTW(x, y, **params).result
+            result = DTW(x, y, path="linear", **params).result
+            np.testing.assert_array_equal(result.path, expected_result.path)
+            self.assertEqual(result.path_costs, expected_result.path_costs)
+            self.assertEqual(result.statistics, expected_result.statistics)
+
+    def test_linear_path_alignment_costs(self):
+        x = [0, 3, 6, 2, 4, 1, 1, 1, 1, 1, 9, 0]
+        y = [0, 1, 4, 2, 1, 6, 9, 1, 4, 6, 5, 5]
+        dtw = DTW(x, y, path="linear")
+        for method in ['d-method', 'td-method', 'c-method']:
+            self.assertEqual(dtw.calc_alignment_cost(method=method), DTW(x, y).calc_alignment_cost(method=method))
+        self.assertIsNone(dtw.result.matrix)
+
+    def test_traceback_follows_minimum_predecessor(self):
+        # with large distances sums of a distance and different predecessors are equal after rounding
+        x = [3, 0, 1e17, 3]
+        y = [0, 3, 2, 0]
+        dtw = DTW(x, y)
+        matrix = dtw.fill_matrix()
+        path = dtw.result.path
+        for (i, j), (previous_i, previous_j) in zip(path[:-1], path[1:]):
+            predecessors = [matrix[i, j], matrix[i, j + 1], matrix[i + 1, j]]
+            self.assertEqual(matrix[previous_i + 1, previous_j + 1], min(predecessors))
+
     def test_calc_alignment_cost_d_method(self):
         result = np.round(self.dtw.calc_alignment_cost(method='d-method'), 4)
         self.assertEqual(result, 0.0385)
 
+    def test_d_method_without_matrix_equals_full_matrix(self):
+        rng = np.random.default_rng(4)
+        for n, m in [(30, 20), (20, 30)]:
+            x, y = rng.normal(size=n), rng.normal(size=m)
+            for params in [{}, {"constraint": "sakoe-chiba", "radius": 4}, {"constraint": "itakura", "slope": 2}]:
+                for engine in ["wavefront", "loop"]:
+                    dtw = DTW(x, y, engine=engine, **params)
+                    result = dtw.calc_alignment_cost(method='d-method')
+                    expected_result = dtw.fill_matrix()[n, m] / (n + m)
+                    self.assertEqual(result, expected_result)
+
     def test_calc_alignment_cost_td_method(self):
         result = np.round(self.dtw.calc_alignment_cost(method='td-method'), 3)
         self.assertEqual(result, 0.375)
@@ -52,6 +506,172 @@ class TestDTW(unittest.TestCase):
         result = np.round(self.dtw.calc_alignment_cost(method='c-method'), 3)
         self.assertEqual(result, 0.375)
 
+    def test_calc_alignment_costs(self):
+        result = self.dtw.calc_alignment_costs()
+        for method in ['d-method', 'td-method', 'c-method']:
+            self.assertEqual(result[method], self.dtw.calc_alignment_cost(method=method))
+
+    def test_sliding_window_dtw_all_methods(self):
+        x = [0, 3, 6, 2, 4, 1, 1, 1, 1, 1, 9, 0]
+        y = [0, 1, 4, 2, 1, 6, 9, 1, 4, 6, 5, 5]
+        dtw = DTW(x, y)
+        result, windows, _ = dtw.sliding_window_dtw(window_size=5, step=2, method='all')
+        self.assertEqual(len(result), len(windows))
+        for method in ['d-method', 'td-method', 'c-method']:
+            expected_result, _, _ = dtw.sliding_window_dtw(window_size=5, step=2, method=method)
+            np.testing.assert_array_equal(result[method], expected_result)
+
+    def test_sliding_window_dtw_batch(self):
+        rng = np.random.default_rng(6)
+        x, y = rng.normal(size=60), rng.normal(size=52)
+        for params in [{}, {"constraint": "sakoe-chiba", "radius": 2}]:
+            dtw = DTW(x, y, **params)
+            for method in ['d-method', 'td-method', 'c-method', 'all']:
+                result = dtw.sliding_window_dtw(window_size=10, step=3, method=method, batch=True)
+                expected_result = dtw.sliding_window_dtw(window_size=10, step=3, method=method)
+                np.testing.assert_array_equal(result[0], expected_result[0])
+                self.assertEqual(result[1], expected_result[1])
+                for matrix, expected_matrix in zip(result[2], expected_result[2]):
+                    np.testing.assert_array_equal(matrix, expected_matrix)
+
+    def test_parallel_pairs_equal_serial(self):
+        rng = np.random.default_rng(9)
+        pairs = [(rng.normal(size=40), rng.normal(size=35)) for _ in range(6)]
+        for method in ['d-method', 'c-method']:
+            result = alignment_costs(pairs, method=method, max_workers=3, var="DDTW")
+            expected_result = [DTW(x, y, var="DDTW").calc_alignment_cost(method=method) for x, y in pairs]
+            self.assertEqual(result, expected_result)
+        result = sliding_window_costs(pairs, window_size=10, step=5, method='td-method', max_workers=3)
+        for (costs, windows, _), (x, y) in zip(result, pairs):
+            expected_result = DTW(x, y).sliding_window_dtw(window_size=10, step=5, method='td-method')
+            self.assertEqual(costs, expected_result[0])
+            self.assertEqual(windows, expected_result[1])
+
+    def test_sliding_window_dtw_matrix_dtype(self):
+        x, y = np.arange(30, dtype=float), np.arange(30, dtype=float)[::-1]
+        for batch in [False, True]:
+            _, _, matrices = self.dtw.sliding_window_dtw(window_size=5, step=1, method='d-method', batch=batch)
+            self.assertEqual(matrices[0].dtype, np.float32)
+            _, _, matrices = DTW(x, y).sliding_window_dtw(window_size=5, step=5, method='d-method', batch=batch,
+                                                          matrix_dtype=float)
+            self.assertEqual(matrices[0].dtype, np.float64)
+
+    def test_iter_sliding_window_dtw(self):
+        rng = np.random.default_rng(15)
+        dtw = DTW(rng.normal(size=40), rng.normal(size=33))
+        for batch in [False, True]:
+            expected_result = dtw.sliding_window_dtw(window_size=6, step=4, method='c-method', batch=batch)
+            results = list(dtw.iter_sliding_window_dtw(window_size=6, step=4, method='c-method', batch=batch))
+            self.assertEqual([window for window, _, _ in results], expected_result[1])
+            self.assertEqual([cost for _, cost, _ in results], list(expected_result[0]))
+            for (_, _, matrix), expected_matrix in zip(results, expected_result[2]):
+                np.testing.assert_array_equal(matrix, expected_matrix)
+            results = dtw.iter_sliding_window_dtw(window_size=6, step=4, method='d-method', batch=batch,
+                                                  matrices=False)
+            self.assertTrue(all(matrix is None for _, _, matrix in results))
+
+    def test_streaming_reducers(self):
+        values = [0.1, 0.7, 0.2, 0.1, 0.7]
+        self.assertAlmostEqual(streaming_mean(iter(values)), np.mean(values))
+        self.assertTrue(np.isnan(streaming_mean(iter([]))))
+        self.assertEqual(streaming_extreme(enumerate(values), "MIN"), (0.1, [0, 3]))
+        self.assertEqual(streaming_extreme(enumerate(values), "MAX"), (0.7, [1, 4]))
+        with self.assertRaises(ValueError):
+            streaming_extreme(iter([]), "MIN")
+
+    def test_pair_grid_equals_pairs(self):
+        rng = np.random.default_rng(0)
+        xs = {"a": rng.normal(size=40), "b": rng.normal(size=40)}
+        ys = {"c": rng.normal(size=40), "d": rng.normal(size=40)}
+        tables = DTW.pair_grid(xs, ys, window_size=6, step=4, method="all", var="DDTW")
+        for method in ['d-method', 'td-method', 'c-method']:
+            single = DTW.pair_grid(xs, ys, window_size=6, step=4, method=method, pairs=[("b", "c")], var="DDTW")
+            for x_name, y_name in [("a", "c"), ("a", "d"), ("b", "c"), ("b", "d")]:
+                costs, windows, _ = DTW(xs[x_name], ys[y_name], var="DDTW").sliding_window_dtw(6, 4, method)
+                self.assertEqual(list(tables[method]["Window"]), windows)
+                self.assertEqual(list(tables[method][f"{x_name}-{y_name}"]), costs)
+            self.assertEqual(list(single.columns), ["Window", "b-c"])
+            self.assertEqual(list(single["b-c"]), list(tables[method]["b-c"]))
+        with self.assertRaises(ValueError):
+            DTW.pair_grid(xs, {"c": np.zeros(30)}, window_size=6, step=4, method="c-method")
+        for method in ['d-method', 'all']:
+            for prefilter in [Prefilter(candidates=3), Prefilter(max_cost=0.3)]:
+                tables = DTW.pair_grid(xs, ys, window_size=6, step=4, method=method, var="DDTW",
+                                       constraint="sakoe-chiba", radius=2, prefilter=prefilter)
+                for x_name, y_name in [("a", "c"), ("a", "d"), ("b", "c"), ("b", "d")]:
+                    dtw = DTW(xs[x_name], ys[y_name], var="DDTW", constraint="sakoe-chiba", radius=2)
+                    costs = dtw.sliding_window_dtw(6, 4, method, prefilter=prefilter)[0]
+                    result = (tables if method == "d-method" else tables["c-method"])[f"{x_name}-{y_name}"]
+                    expected_result = costs if method == "d-method" else [cost["c-method"] for cost in costs]
+                    self.assertEqual(list(result), expected_result)
+
+    def test_multivariate(self):
+        x = np.array([[0, 1], [2, 0], [0, 3], [1, 1]])
+        y = np.array([[0, 0], [2, 1], [1, 3]])
+        result = DTW(x, y).fill_matrix()
+        self.assertEqual(result[4, 3], 5)
+        rng = np.random.default_rng(0)
+        x, y = rng.normal(size=(30, 3)), rng.normal(size=(25, 3))
+        expected_result = DTW(x, y, var="DDTW", engine="loop").calc_alignment_costs()
+        for engine, path in [("wavefront", "matrix"), ("wavefront", "linear"), ("loop", "linear")]:
+            result = DTW(x, y, var="DDTW", engine=engine, path=path).calc_alignment_costs()
+            self.assertEqual(result.tolist(), expected_result.tolist())
+        univariate = DTW(x[:, 0], y[:, 0]).calc_alignment_costs()
+        self.assertEqual(DTW(x[:, :1], y[:, :1]).calc_alignment_costs().tolist(), univariate.tolist())
+        with self.assertRaises(ValueError):
+            DTW(x, y[:, :2])
+
+    def test_multivariate_sliding_window(self):
+        rng = np.random.default_rng(1)
+        dtw = DTW(rng.normal(size=(60, 2)), rng.normal(size=(60, 2)))
+        expected_result = dtw.sliding_window_dtw(window_size=8, step=3, method='all')[0]
+        result = dtw.sliding_window_dtw(window_size=8, step=3, method='all', batch=True)[0]
+        self.assertEqual(result.tolist(), expected_result.tolist())
+        with patch("matplotlib.pyplot.show"):
+            for look_for in ["MIN", "MAX"]:
+                expected_result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=8, step=3)
+                result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=8, step=3,
+                                                 prune=True)
+                self.assertEqual(result, expected_result)
+        plt.close("all")
+
+    def test_cache(self):
+        rng = np.random.default_rng(17)
+        x, y = rng.normal(size=40), rng.normal(size=35)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            expected_result = DTW(x, y, var="DDTW").calc_alignment_costs()
+            self.assertEqual(DTW(x, y, var="DDTW", cache=cache).calc_alignment_costs(), expected_result)
+            result = DTW(x, y, var="DDTW", engine="loop", path="linear", cache=cache).calc_alignment_costs()
+            self.assertEqual(result, expected_result)
+            expected_result = DTW(x, y).sliding_window_dtw(window_size=8, step=3, method='all')[0]
+            for method in ['all', 'td-method']:
+                windows = DTW(x, y, cache=cache).iter_sliding_window_dtw(window_size=8, step=3, method=method,
+                                                                         matrices=False)
+                result = [alignment_cost for _, alignment_cost, _ in windows]
+                self.assertEqual(result, list(expected_result if method == 'all' else expected_result[method]))
+            self.assertEqual(len(os.listdir(directory)), 2)
+            ResultCache(directory, max_bytes=1).put("key", costs=np.zeros(3))
+            self.assertEqual(os.listdir(directory), [])
+            expected_costs, _, expected_matrices = DTW(x, y).sliding_window_dtw(window_size=8, step=3,
+                                                                                method='td-method')
+            # matrices are filled again for cached costs, without warping paths
+            for batch, cached in [(True, False), (True, True), (False, True)]:
+                with patch("dtw.trace_paths_batch", wraps=trace_paths_batch) as traced:
+                    costs, _, matrices = DTW(x, y, cache=cache).sliding_window_dtw(window_size=8, step=3,
+                                                                                   method='td-method', batch=batch)
+                self.assertEqual(costs, expected_costs)
+                for matrix, expected_matrix in zip(matrices, expected_matrices):
+                    np.testing.assert_array_equal(matrix, expected_matrix)
+                self.assertEqual(traced.called, batch and not cached)
+            # a directory is listed once and then the size is updated by every write
+            cache = ResultCache(directory)
+            with patch("os.scandir", wraps=os.scandir) as scanned:
+                for k in range(30):
+                    cache.put(f"key{k}", costs=np.zeros(3))
+            self.assertEqual(scanned.call_count, 1)
+            self.assertEqual(len(os.listdir(directory)), 31)
+
     def test_calc_alignment_cost_error(self):
         with self.assertRaises(ValueError):
             self.dtw.calc_alignment_cost(method='N/A')
@@ -101,6 +721,46 @@ class TestDTW(unittest.TestCase):
                                              filename="test_plot")
         self.assertEqual(result, 2.1)
 
+    @patch("matplotlib.pyplot.savefig")
+    def test_find_alignment_cost_pruned_equals_full(self, mock_savefig):
+        rng = np.random.default_rng(11)
+        x, y = np.cumsum(rng.normal(size=70)), np.cumsum(rng.normal(size=64))
+        for params in [{}, {"constraint": "sakoe-chiba", "radius": 2}, {"engine": "loop"}]:
+            dtw = DTW(x, y, **params)
+            for look_for in ["MIN", "MAX"]:
+                with patch("matplotlib.pyplot.show"):
+                    result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=8, step=2,
+                                                     prune=True)
+                    expected_result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=8,
+                                                              step=2)
+                plt.close("all")
+                self.assertEqual(result, expected_result)
+
+    @patch("matplotlib.pyplot.show")
+    def test_find_alignment_cost_coarse_to_fine(self, mock_show):
+        rng = np.random.default_rng(18)
+        dtw = DTW(np.cumsum(rng.normal(size=120)), np.cumsum(rng.normal(size=120)))
+        for look_for in ["MIN", "MAX"]:
+            expected_result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=10, step=1)
+            result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=10, step=1,
+                                             coarse_step=8, candidates=1, tolerance=0)
+            self.assertEqual(result, expected_result)
+            result = dtw.find_alignment_cost(method='d-method', look_for=look_for, window_size=10, step=1,
+                                             coarse_step=8, tolerance=0.5)
+            self.assertLessEqual(max(result, expected_result) / min(result, expected_result), 1.5)
+        expected_result = dtw.find_alignment_cost(method='td-method', look_for="MIN", window_size=10, step=2)
+        result = dtw.find_alignment_cost(method='td-method', look_for="MIN", window_size=10, step=2, coarse_step=6)
+        self.assertGreaterEqual(result, expected_result)
+        with self.assertRaises(ValueError):
+            dtw.find_alignment_cost(method='d-method', look_for="MIN", window_size=10, step=2, coarse_step=5)
+        with self.assertRaises(ValueError):
+            dtw.find_alignment_cost(method='c-method', look_for="MIN", window_size=10, coarse_step=5, tolerance=0)
+        plt.close("all")
+
+    def test_find_alignment_cost_pruned_method_error(self):
+        with self.assertRaises(ValueError):
+            self.dtw.find_alignment_cost(method='c-method', look_for="MIN", window_size=5, step=1, prune=True)
+
     def test_find_alignment_cost_look_for_error(self):
         x = [0, 3, 6, 2, 4, 1, 1, 1, 1, 1, 9, 0]
         y = [0, 1, 4, 2, 1, 6, 9, 1, 4, 6, 5, 5]
@@ -3,9 +3,14 @@
 """
 
 from project.dtw.dtw import DTW
+import numpy as np
 import pandas as pd
 import os
 
+# matrices are exported as float32, which halves memory and size of files, cells of float64 matrices are rounded by
+# a relative error of at most 6e-8 on export, while alignment costs are calculated from float64 cells before it
+MATRIX_DTYPE = np.float32
+
 print("=== Starting DDTW ===")
 data_path = "C:/Python/ZSSI/data/dtw/preprocessed"
 breaths = os.listdir(data_path)
@@ -30,7 +35,8 @@ for breath in breaths:
             matrices = []
             windows = None
             for i, dtw in enumerate(dtw_list):
-                cost, wds, matrices = dtw.sliding_window_dtw(window_size=10, step=5, method=method)
+                cost, wds, matrices = dtw.sliding_window_dtw(window_size=10, step=5, method=method,
+                                                             matrix_dtype=MATRIX_DTYPE)
                 vals.append(cost)
                 if i == 0:
                     windows = wds
@@ -2,7 +2,9 @@
 @author: Radosław Plawecki
 """
 
+from project.dtw.cache import ResultCache
 from project.dtw.dtw import DTW
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import os
 
@@ -73,54 +75,98 @@ for file in files:
         df = pd.DataFrame(data)
         df.to_csv(f"C:/Python/ZSSI/data2/dtw/dtw/{method}/{file_no_extension}_DTW.csv", sep=';', index=False)"""
 
-print("=== Starting DDTW ===")
-data_path = "C:/Python/ZSSI/data/dtw/preprocessed"
-breaths = os.listdir(data_path)
-for breath in breaths:
-    print(f"\n=== Directory: {breath} ===")
-    files = os.listdir(os.path.join(data_path, breath))
-    for file in files:
-        print(f"{file} being processed...")
-        try:
-            data = pd.read_csv(os.path.join(data_path, breath, file), delimiter=';')
-            df = pd.DataFrame(data)
-            method = 'd-method'
-            (abp_spo, abp_spp, abp_rr,
-             cbfv_spo, cbfv_spp, cbfv_rr) = (df["ABP_SPO"], df["ABP_SPP"], df["ABP_RR"],
-                                             df["CBFV_SPO"], df["CBFV_SPP"], df["CBFV_RR"])
-
-            pairs = [(abp_spo, cbfv_spo), (abp_spp, cbfv_spp), (abp_spo, cbfv_spp), (abp_spp, cbfv_spo), (abp_rr, cbfv_spo),
-                     (abp_rr, cbfv_spp), (abp_spo, cbfv_rr), (abp_spp, cbfv_rr), (abp_rr, cbfv_rr)]
-
-            dtw_list = [DTW(x, y, var="DDTW") for x, y in pairs]
-            vals = []
-            windows = None
-            for i, dtw in enumerate(dtw_list):
-                cost, wds, trs = dtw.sliding_window_dtw(window_size=10, step=5, method=method)
-                vals.append(cost)
-                if i == 0:
-                    windows = wds
-            (col1, col2, col3, col4, col5,
-             col6, col7, col8, col9, col10) = ("Window", "ABP_SPO-CBFV_SPO", "ABP_SPP-CBFV_SPP", "ABP_SPO-CBFV_SPP",
-                                               "ABP_SPP-CBFV_SPO", "ABP_RR-CBFV_SPO", "ABP_RR-CBFV_SPP", "ABP_SPO-CBFV_RR",
-                                               "ABP_SPP-CBFV_RR", "ABP_RR-CBFV_RR")
-            data = {
-                col1: windows,
-                col2: vals[0],
-                col3: vals[1],
-                col4: vals[2],
-                col5: vals[3],
-                col6: vals[4],
-                col7: vals[5],
-                col8: vals[6],
-                col9: vals[7],
-                col10: vals[8]
-            }
-            file_no_extension = os.path.splitext(file)[0]
-
-            df = pd.DataFrame(data)
-            # df.to_csv(f"C:/Python/ZSSI/data/dtw/dtw/{method}/{breath}/{file_no_extension}_DTW.csv", sep=';', index=False)
+DATA_PATH = "C:/Python/ZSSI/data/dtw/preprocessed"
+OUTPUT_PATH = "C:/Python/ZSSI/data/dtw/dtw"
+# pairs of ABP and CBFV metrics compared in each file, in the order of columns of an output table
+PAIRS = [("ABP_SPO", "CBFV_SPO"), ("ABP_SPP", "CBFV_SPP"), ("ABP_SPO", "CBFV_SPP"), ("ABP_SPP", "CBFV_SPO"),
+         ("ABP_RR", "CBFV_SPO"), ("ABP_RR", "CBFV_SPP"), ("ABP_SPO", "CBFV_RR"), ("ABP_SPP", "CBFV_RR"),
+         ("ABP_RR", "CBFV_RR")]
+
+
+def _perform_task(task):
+    """
+    Function to perform DTW with sliding window for all pairs of metrics of one file. Each metric is read and
+    transformed only once, and windows of all pairs are computed together.
+    :param task: tuple with a path to a file, methods, params of DTW and a directory of a cache.
+    :return: tables with alignment costs of all pairs for each method, or None and the error message if a task failed.
+    """
+    filepath, methods, window_size, step, var, cache_path = task
+    try:
+        df = pd.read_csv(filepath, delimiter=';')
+        cache = None if cache_path is None else ResultCache(cache_path)
+        # a single method without a cache needs no warping paths for the distance method, a cache stores all methods
+        method = methods[0] if len(methods) == 1 and cache_path is None else "all"
+        tables = DTW.pair_grid(df, df, window_size=window_size, step=step, method=method, pairs=PAIRS, var=var,
+                               cache=cache)
+        if method != "all":
+            return {method: tables}, None
+        return {method: tables[method] for method in methods}, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _save_tables(tables, output_path, breath, file):
+    """
+    Function to save tables with alignment costs of a file, creating directories of methods and breaths if needed.
+    :param tables: tables with alignment costs by methods.
+    :param output_path: path to save tables in.
+    :param breath: directory of a breath.
+    :param file: name of a file with metrics.
+    :return: None, or the error message if a table could not be saved.
+    """
+    file_no_extension = os.path.splitext(file)[0]
+    try:
+        for method, df in tables.items():
+            directory = os.path.join(output_path, method, breath)
+            os.makedirs(directory, exist_ok=True)
+            df.to_csv(os.path.join(directory, f"{file_no_extension}_DTW.csv"), sep=';', index=False)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def perform_dtw(data_path=DATA_PATH, output_path=OUTPUT_PATH, methods=("d-method",), window_size=10, step=5, var="DDTW",
+                max_workers=None, chunksize=1, cache_path=None):
+    """
+    Function to perform DTW with sliding window on all files in directories of breaths. Every file is a separate task
+    computed by a pool of processes, and results are collected in the order of files.
+    :param data_path: path to directories of breaths with preprocessed metrics.
+    :param output_path: path to save tables with alignment costs in, in directories of methods and breaths created if
+                        needed, None not to save them.
+    :param methods: methods to calculate alignment cost.
+    :param window_size: size of a window.
+    :param step: step between windows.
+    :param var: variant of DTW, classic (None) or derivative (DDTW).
+    :param max_workers: maximum number of processes, by default the number of processors.
+    :param chunksize: number of files sent to a process at once.
+    :param cache_path: directory of a cache of alignment costs shared by processes, None not to use a cache. Files
+                       with unchanged metrics and params are read from a cache instead of being computed.
+    :return: list with failed tasks, including files whose tables could not be saved, as (breath, file, error message)
+             tuples.
+    """
+    files = [(breath, file) for breath in os.listdir(data_path) for file in os.listdir(os.path.join(data_path, breath))]
+    tasks = [(os.path.join(data_path, breath, file), methods, window_size, step, var, cache_path)
+             for breath, file in files]
+    failures = []
+    print("=== Starting DDTW ===")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_perform_task, tasks, chunksize=chunksize)
+        previous_breath = None
+        for (breath, file), (tables, error) in zip(files, results):
+            if breath != previous_breath:
+                print(f"\n=== Directory: {breath} ===")
+                previous_breath = breath
+            print(f"{file} being processed...")
+            if error is None and output_path is not None:
+                error = _save_tables(tables, output_path, breath, file)
+            if error is not None:
+                print(f"✖ Failed ({error})")
+                failures.append((breath, file, error))
+                continue
             print("✔ Success")
-        except Exception as e:
-            print(f"✖ Failed ({e})")
-print("\n=== DDTW completed ===")
+    print("\n=== DDTW completed ===")
+    return failures
+
+
+if __name__ == "__main__":
+    perform_dtw()